@@ -1,33 +1,57 @@
 import cv2
 from gun_and_human_detection import detect_objects
 from face_recognition_module import recognize_faces
+from motion_gate import MotionGate
+from clip_recorder import ClipRecorder
+from unknown_faces import UnknownFaceStore
+
+# Print the motion gate statistics every this many frames
+GATE_REPORT_INTERVAL = 500
 
 
 def main():
     cap = cv2.VideoCapture(0)  # Use your CCTV camera feed
+    motion_gate = MotionGate()
+    recorder = ClipRecorder()  # Keeps the last seconds of video for event clips
+    unknown_faces = UnknownFaceStore()  # One cluster per stranger instead of one image per frame
     while cap.isOpened():
         ret, frame = cap.read()
         if not ret:
             break
 
+        recorder.add_frame(frame)
+
+        # Step 0: Only run detection when something moves (or the keep-alive is due)
+        process = motion_gate.should_process(frame)
+        if motion_gate.evaluated % GATE_REPORT_INTERVAL == 0:
+            print(motion_gate.report())
+        if not process:
+            continue
+
         # Step 1: Object detection (guns, humans)
-        detections = detect_objects(frame)
+        detections, _ = detect_objects(frame)
 
         # Step 2: Check for guns or humans
-        if 'gun' in detections:
+        if detections.has_label('gun'):
             print("Gun detected! Triggering alert...")
             # Call alert system function
+            recorder.trigger('gun')
 
-        if 'human' in detections:
+        if detections.has_label('person'):
             print("Human detected, starting face recognition...")
-            faces = recognize_faces(frame)
+            faces, _ = recognize_faces(frame, draw=False)
             for face in faces:
-                if face['recognized']:
+                if face['name'] != "Unknown":
                     print(f"Recognized: {face['name']}")
                 else:
-                    print("Unknown face detected, storing image...")
-                    # Save or alert
-
+                    cluster_id, is_new = unknown_faces.add(face['encoding'], frame, face['location'])
+                    if is_new:
+                        print(f"New unknown face, stored as {cluster_id}")
+                    recorder.trigger('unknown_face')
+
+    print(motion_gate.report())
+    recorder.stop()
+    unknown_faces.save()
     cap.release()
     cv2.destroyAllWindows()
 
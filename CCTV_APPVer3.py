@@ -2,11 +2,40 @@ import cv2
 import serial.tools.list_ports
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
 from gun_and_human_detection import detect_objects
-from face_recognition_module import recognize_faces
+from face_tracker import FaceTracker
+from frame_pipeline import CameraCapture, FramePipeline
+from motion_gate import MotionGate
+from inference_scheduler import AdaptiveScheduler
+from display import DisplayCompositor, FrameSlot
+from alert_dispatcher import AlertDispatcher
+from clip_recorder import ClipRecorder
+from unknown_faces import UnknownFaceStore
+from camera_discovery import CameraDiscovery, describe_camera, parse_camera_index
+from metrics import MetricsExporter, MetricsRegistry
+from model_warmup import ModelWarmup
+from gallery_watcher import GalleryWatcher
+from shared_frames import ProcessPipeline
+from detection_zones import DetectionZones
 import threading
 
+# Stage metrics are only collected when exported: set a port to serve Prometheus text on
+# http://127.0.0.1:<port>/metrics and/or a file to append a JSON snapshot to every 10 s
+METRICS_PORT = None
+METRICS_JSONL = None
+
+# Run detection and face recognition in two worker processes that read frames from shared memory,
+# so they use separate cores and do not compete with the display for the GIL
+USE_WORKER_PROCESSES = False
+
+# Seconds between checks of known_faces for added, changed or removed photos (None: load them once)
+GALLERY_RELOAD_INTERVAL = 5.0
+
+# Optional regions of interest per camera index: 'zones' are polygons of [x, y] frame pixels where
+# detections count, 'exclude' polygons are cut out of them, e.g.
+# {0: {'zones': [[[200, 300], [1080, 300], [1280, 720], [0, 720]]], 'exclude': []}}
+CAMERA_ZONES = {}
+
 
 class CCTVApp:
     def __init__(self, root):
@@ -18,7 +47,21 @@ class CCTVApp:
         self.selected_camera = tk.StringVar()
         self.selected_port = tk.StringVar()
         self.cap = None
+        self.camera_id = None
         self.serial_connection = None
+        self.alerts = None  # Writes alerts to the serial connection on its own thread
+        self.recorder = ClipRecorder()  # Saves pre/post-event clips in the background
+        self.unknown_faces = UnknownFaceStore()  # Clusters strangers, one entry per distinct person
+        self.pipeline = None
+
+        self.metrics = MetricsRegistry(enabled=METRICS_PORT is not None or METRICS_JSONL is not None)
+        self.metrics_exporter = None
+        if self.metrics.enabled:
+            self.metrics_exporter = MetricsExporter(self.metrics, port=METRICS_PORT, jsonl_path=METRICS_JSONL)
+            self.metrics_exporter.start()
+
+        # Cameras are probed in the background; the dropdown starts with the cached list
+        self.camera_discovery = CameraDiscovery()
 
         # Layout configuration
         self.root.columnconfigure(0, weight=1)
@@ -35,6 +78,9 @@ class CCTVApp:
         self.camera_button = tk.Button(root, text="Select Camera", command=self.select_camera)
         self.camera_button.grid(row=2, column=0, padx=5, pady=5, sticky='w')
 
+        self.refresh_button = tk.Button(root, text="Refresh Cameras", command=self.refresh_cameras)
+        self.refresh_button.grid(row=1, column=2, padx=5, pady=5)
+
         # Dropdown for serial port selection
         self.port_label = tk.Label(root, text="Select Serial Port:")
         self.port_label.grid(row=0, column=1, padx=5, pady=5, sticky='w')
@@ -54,18 +100,64 @@ class CCTVApp:
         self.video_label = tk.Label(root)
         self.video_label.grid(row=3, column=0, columnspan=3, sticky='nsew')
 
+        # The render stage hands annotated frames over here; the compositor shows them from the Tk loop
+        self.display_slot = FrameSlot()
+        self.display = DisplayCompositor(root, self.video_label, self.display_slot, max_fps=25,
+                                         metrics=self.metrics.camera('display'))
+        self.display.start()
+
+        # Model loading progress, then the current inference quality, so operators know what they are getting
+        self.status_label = tk.Label(root, text="", anchor='w')
+        self.status_label.grid(row=4, column=0, columnspan=3, padx=5, pady=5, sticky='we')
+
         # Closing protocol
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
+        self.refresh_cameras()
+
+        # The models load in the background, so the window does not wait for them. With worker
+        # processes they are loaded there instead, when CCTV starts, and the pipeline reports when they are ready
+        self.warmup = None if USE_WORKER_PROCESSES else ModelWarmup()
+        if self.warmup:
+            self.warmup.start()
+        self.poll_warmup()
+
+        # New photos in known_faces are picked up while running; with worker processes
+        # the recognizer process watches them itself, since it holds the gallery in use
+        self.gallery_watcher = None
+        if GALLERY_RELOAD_INTERVAL and not USE_WORKER_PROCESSES:
+            self.gallery_watcher = GalleryWatcher(GALLERY_RELOAD_INTERVAL)
+            self.gallery_watcher.start()
+
+    def poll_warmup(self):
+        """Shows the model loading progress until the models are ready; runs on the Tk main loop."""
+        if self.pipeline and self.pipeline.running:
+            return  # update_status owns the label now
+        if self.warmup is None:
+            self.status_label.configure(text="Models are loaded in the worker processes when CCTV starts")
+            return
+        self.status_label.configure(text=self.warmup.status())
+        if not self.warmup.ready.is_set() and not self.warmup.error:
+            self.root.after(200, self.poll_warmup)
+
     def detect_cameras(self):
-        """Detects available cameras."""
-        camera_indices = []
-        for i in range(5):  # Check first 5 camera indices
-            cap = cv2.VideoCapture(i)
-            if cap.read()[0]:
-                camera_indices.append(str(i))
-            cap.release()
-        return camera_indices if camera_indices else ["No Camera Found"]
+        """Returns the cameras found so far (the cached list until probing finishes)."""
+        camera_names = [describe_camera(camera) for camera in self.camera_discovery.cameras]
+        if camera_names:
+            return camera_names
+        return ["Searching for cameras..."] if self.camera_discovery.probing else ["No Camera Found"]
+
+    def refresh_cameras(self):
+        """Probe the cameras again in the background, except the one that is open."""
+        in_use = [self.camera_id] if self.cap is not None and self.cap.isOpened() else []
+        self.camera_discovery.refresh(in_use=in_use)
+        self.poll_cameras()
+
+    def poll_cameras(self):
+        """Update the camera dropdown from the Tk main loop until probing finishes."""
+        self.camera_dropdown['values'] = self.detect_cameras()
+        if self.camera_discovery.probing:
+            self.root.after(250, self.poll_cameras)
 
     def detect_serial_ports(self):
         """Detects available serial ports."""
@@ -74,9 +166,10 @@ class CCTVApp:
 
     def select_camera(self):
         """Select the camera based on user input."""
-        camera_index = self.selected_camera.get()
-        if camera_index.isdigit():
-            self.cap = cv2.VideoCapture(int(camera_index))
+        camera_index = parse_camera_index(self.selected_camera.get())
+        if camera_index is not None:
+            self.camera_id = camera_index
+            self.cap = cv2.VideoCapture(camera_index)
             if not self.cap.isOpened():
                 messagebox.showerror("Error", "Cannot open selected camera.")
         else:
@@ -86,7 +179,11 @@ class CCTVApp:
         """Connect to the selected serial port."""
         port = self.selected_port.get()
         try:
-            self.serial_connection = serial.Serial(port, baudrate=9600, timeout=1)
+            self.serial_connection = serial.Serial(port, baudrate=9600, timeout=1, write_timeout=1)
+            if self.alerts:
+                self.alerts.stop()
+            self.alerts = AlertDispatcher.for_serial(port, connection=self.serial_connection,
+                                                     metrics=self.metrics.camera('alerts'))
             messagebox.showinfo("Success", f"Connected to {port}")
         except Exception as e:
             messagebox.showerror("Error", f"Cannot connect to {port}: {e}")
@@ -96,57 +193,102 @@ class CCTVApp:
         if not self.cap or not self.cap.isOpened():
             messagebox.showerror("Error", "Camera is not selected or not available.")
             return
+        if self.pipeline and self.pipeline.running:
+            return
+        if self.warmup and self.warmup.error:
+            messagebox.showerror("Error", self.warmup.status())
+            return
+
+        # If the models are still loading, the pipeline waits for them on its first frame.
+        # Starting it here, on the Tk thread, also lets the status updates be scheduled from here
+        self.pipeline = self.create_pipeline()
+        self.pipeline.start()
+        self.root.after(0, self.update_status)
 
         cctv_thread = threading.Thread(target=self.run_cctv, daemon=True)
         cctv_thread.start()
 
-    def run_cctv(self):
-        """Run the CCTV surveillance loop."""
-        while self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-
-            # Step 1: Object detection (guns, humans)
-            detections = detect_objects(frame)
-
-            # Step 2: Check for guns or humans
-            if 'gun' in detections:
-                print("Gun detected! Triggering alert...")
-                if self.serial_connection:
-                    self.serial_connection.write(b'ALERT: Gun detected!\n')
-
-            if 'human' in detections:
-                print("Human detected, starting face recognition...")
-                faces, annotated_frame = recognize_faces(frame)
-                for face in faces:
-                    if face['name'] != "Unknown":
-                        print(f"Recognized: {face['name']}")
-                    else:
-                        print("Unknown face detected.")
+    def handle_detections(self, seq, detections):
+        """Called by the detection stage for every processed frame."""
+        if detections.has_label('gun'):
+            print(f"Gun detected in frame {seq}! Triggering alert...")
+            self.recorder.trigger('gun')
+            if self.alerts:
+                self.alerts.alert('gun', 'ALERT: Gun detected!', camera=self.camera_id)
+
+    def handle_faces(self, seq, faces, frame):
+        """Called by the recognition stage for every frame that contained a person."""
+        for face in faces:
+            if face['name'] != "Unknown":
+                print(f"Recognized in frame {seq}: {face['name']}")
             else:
-                annotated_frame = frame
+                print(f"Unknown face detected in frame {seq}.")
+                self.recorder.trigger('unknown_face')
+                # Tracked faces are only encoded when new or re-verified, so repeats are not stored again
+                if face['encoding'] is not None:
+                    cluster_id, is_new = self.unknown_faces.add(face['encoding'], frame, face['location'])
+                    if is_new:
+                        print(f"New unknown face, stored as {cluster_id}")
+
+    def update_status(self):
+        """Shows the current inference mode; runs on the Tk main loop while the pipeline runs."""
+        if self.pipeline and self.pipeline.running:
+            status = self.pipeline.scheduler.status()
+            if self.warmup and not self.warmup.ready.is_set():
+                status = f"{self.warmup.status()}; {status}"
+            elif isinstance(self.pipeline, ProcessPipeline) and self.pipeline.model_status():
+                status = f"{self.pipeline.model_status()}; {status}"
+            self.status_label.configure(text=status)
+            self.root.after(1000, self.update_status)
+        elif self.pipeline and self.pipeline.error:
+            self.status_label.configure(text=f"Stopped: {self.pipeline.error}")
 
-            # Convert frame to Image for Tkinter display
-            rgb_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(rgb_frame)
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
+    def create_pipeline(self):
+        """Builds the capture / detect / recognize pipeline for the selected camera."""
+        # Faces are tracked between frames so only new or uncertain faces are re-encoded
+        metrics = self.metrics.camera(f"camera{self.camera_id}")
+        zones = DetectionZones.from_config(CAMERA_ZONES.get(self.camera_id, {}))
+        if USE_WORKER_PROCESSES:
+            # The face tracker lives in the recognizer process
+            return ProcessPipeline(CameraCapture(self.cap, metrics=metrics),
+                                   on_detections=self.handle_detections, on_faces=self.handle_faces,
+                                   motion_gate=MotionGate(), faces_in_people=True,
+                                   scheduler=AdaptiveScheduler(latency_budget=0.25), metrics=metrics,
+                                   gallery_reload_interval=GALLERY_RELOAD_INTERVAL, zones=zones)
+        face_tracker = FaceTracker()
+        return FramePipeline(CameraCapture(self.cap, metrics=metrics), detect_objects, face_tracker.recognize,
+                             on_detections=self.handle_detections, on_faces=self.handle_faces,
+                             motion_gate=MotionGate(), faces_in_people=True,
+                             scheduler=AdaptiveScheduler(latency_budget=0.25), metrics=metrics, zones=zones)
 
-            # Stop if 'q' is pressed
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+    def run_cctv(self):
+        """Runs the render stage of the started pipeline and hands the annotated frames to the display."""
+        # Render stage: runs at camera rate, inference results are overlaid as they arrive
+        for seq, annotated_frame in self.pipeline.frames():
+            self.display_slot.put(annotated_frame)
+            self.recorder.add_frame(annotated_frame)
 
+        self.pipeline.stop()
+        print(self.pipeline.motion_gate.report())
         if self.cap:
             self.cap.release()
 
     def on_close(self):
         """Handle cleanup on window close."""
+        self.display.stop()
+        if self.pipeline:
+            self.pipeline.stop()
+        self.recorder.stop()
+        self.unknown_faces.save()
+        if self.gallery_watcher:
+            self.gallery_watcher.stop()
         if self.cap:
             self.cap.release()
-        if self.serial_connection:
-            self.serial_connection.close()
+        if self.alerts:
+            # Also closes the serial connection
+            self.alerts.stop()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
         cv2.destroyAllWindows()
         self.root.quit()
 
@@ -3,7 +3,13 @@ import os
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
 from datetime import datetime
-from PIL import Image, ImageTk
+from display import DisplayCompositor
+from frame_pipeline import CameraCapture
+from capture_writer import CaptureWriter
+from camera_discovery import CameraDiscovery, describe_camera, parse_camera_index
+
+# Minimum time between two burst captures
+BURST_INTERVAL_MS = 100
 
 
 class CameraApp:
@@ -14,9 +20,16 @@ class CameraApp:
 
         self.selected_camera = None
         self.cap = None
+        self.camera_index = None  # Index self.cap was opened with
+        self.capture = None  # Thread reading frames from self.cap
         self.folder_path = ""
         self.session_folder = None  # Folder for current session
         self.final_folder_path = None  # Folder path to save images (updated dynamically)
+        self.writer = CaptureWriter()  # Encodes and saves images in the background
+        self.bursting = False
+        self.burst_folder = None
+        self.burst_last_seq = 0
+        self.progress_scheduled = False
 
         # Main frame for video and controls
         main_frame = Frame(self.root)
@@ -38,9 +51,14 @@ class CameraApp:
         Label(controls_frame, text="Select Camera:").pack(anchor=W, pady=5)
         self.camera_dropdown = ttk.Combobox(controls_frame, state='readonly')
         self.camera_dropdown.pack(fill=X, pady=5)
+        # Cameras are probed in the background; the dropdown starts with the cached list
+        self.camera_discovery = CameraDiscovery()
         self.camera_dropdown['values'] = self.get_available_cameras()
         self.camera_dropdown.current(0)
 
+        self.refresh_button = Button(controls_frame, text="Refresh Cameras", command=self.refresh_cameras)
+        self.refresh_button.pack(fill=X, pady=5)
+
         self.camera_button = Button(controls_frame, text="Show Camera", command=self.show_camera)
         self.camera_button.pack(fill=X, pady=5)
 
@@ -58,44 +76,65 @@ class CameraApp:
 
         # Capture button
         self.capture_button = Button(controls_frame, text="Capture", command=self.capture_image)
-        self.capture_button.pack(fill=X, pady=20)
+        self.capture_button.pack(fill=X, pady=(20, 5))
+
+        # Burst button: keeps saving the displayed frames until pressed again
+        self.burst_button = Button(controls_frame, text="Start Burst", command=self.toggle_burst)
+        self.burst_button.pack(fill=X, pady=5)
+
+        # Capture progress (instead of a dialog per image)
+        self.status_label = Label(controls_frame, text="", wraplength=300)
+        self.status_label.pack(pady=5)
 
-        # Start updating the camera feed
-        self.update_camera()
+        self.refresh_cameras()
+
+        # Start updating the camera feed; frames are read on the capture thread and
+        # shown (downscaled, at most 30 fps) from the Tk main loop
+        self.display = DisplayCompositor(self.root, self.camera_display, max_fps=30, max_size=(640, 480),
+                                         fit_widget=False)
+        self.display.start()
 
     def get_available_cameras(self):
-        index = 0
-        available_cameras = []
-        while True:
-            cap = cv2.VideoCapture(index)
-            if not cap.read()[0]:
-                break
-            else:
-                available_cameras.append(index)
-            cap.release()
-            index += 1
+        available_cameras = [describe_camera(camera) for camera in self.camera_discovery.cameras]
         return available_cameras if available_cameras else [0]
 
+    def refresh_cameras(self):
+        # The camera being shown is not probed again
+        in_use = [self.camera_index] if self.cap is not None and self.cap.isOpened() else []
+        self.camera_discovery.refresh(in_use=in_use)
+        self.poll_cameras()
+
+    def poll_cameras(self):
+        # Fill in the list from the Tk main loop once probing finishes
+        if self.camera_discovery.probing:
+            self.root.after(250, self.poll_cameras)
+            return
+        selected = self.camera_dropdown.get()
+        self.camera_dropdown['values'] = self.get_available_cameras()
+        if selected not in self.camera_dropdown['values']:
+            self.camera_dropdown.current(0)
+
     def show_camera(self):
-        selected_index = self.camera_dropdown.get()
-        if self.cap:
-            self.cap.release()
-        self.cap = cv2.VideoCapture(int(selected_index))
+        selected_index = parse_camera_index(self.camera_dropdown.get()) or 0
+        self.stop_camera()
+        self.cap = cv2.VideoCapture(selected_index)
+        self.camera_index = selected_index
 
         # Set camera resolution to 720p (1280x720)
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 640)
 
-    def update_camera(self):
-        if self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame)
-                imgtk = ImageTk.PhotoImage(image=img)
-                self.camera_display.imgtk = imgtk
-                self.camera_display.configure(image=imgtk)
-        self.root.after(10, self.update_camera)
+        self.capture = CameraCapture(self.cap)
+        self.capture.start()
+        self.display.set_source(self.capture)
+
+    def stop_camera(self):
+        if self.capture:
+            self.capture.stop()
+            self.capture.join(timeout=2)
+            self.capture = None
+        if self.cap:
+            self.cap.release()
 
     def select_folder(self):
         self.folder_path = filedialog.askdirectory()
@@ -108,14 +147,15 @@ class CameraApp:
             os.makedirs(self.session_folder, exist_ok=True)
             self.final_folder_path = None  # Reset final folder path
 
-    def capture_image(self):
-        if not self.cap or not self.cap.isOpened():
+    def prepare_capture_folder(self):
+        # Returns the folder to save captures in, or None (after warning the user) if capturing is not possible
+        if not self.capture or not self.cap.isOpened():
             messagebox.showwarning("Warning", "Camera is not active!")
-            return
+            return None
 
         if not self.session_folder:
             messagebox.showwarning("Warning", "Please select a folder first!")
-            return
+            return None
 
         # Dynamically create the folder based on the textbox value (custom folder name)
         custom_folder_name = self.custom_folder_entry.get().strip()
@@ -126,22 +166,69 @@ class CameraApp:
         else:
             # If no custom name, save images in the session folder
             self.final_folder_path = self.session_folder
+        return self.final_folder_path
 
-        # Get the current frame
-        ret, frame = self.cap.read()
-        if not ret:
+    def capture_image(self):
+        folder = self.prepare_capture_folder()
+        if not folder:
+            return
+
+        # Save the frame currently displayed, taken from the capture thread
+        item = self.capture.read_latest(timeout=1.0)
+        if item is None:
             messagebox.showwarning("Warning", "Failed to capture image!")
             return
+        _, _, frame = item
+
+        # Save the captured image in the final folder (written in the background)
+        self.writer.save(frame, folder)
+        self.update_progress()
+
+    def toggle_burst(self):
+        if self.bursting:
+            self.bursting = False
+            self.burst_button.config(text="Start Burst")
+            return
 
-        # Save the captured image in the final folder
-        image_filename = f"captured_image_{datetime.now().strftime('%H-%M-%S')}.jpg"
-        file_path = os.path.join(self.final_folder_path, image_filename)
-        cv2.imwrite(file_path, frame)
-        messagebox.showinfo("Success", f"Image saved at {file_path}")
+        self.burst_folder = self.prepare_capture_folder()
+        if not self.burst_folder:
+            return
+        self.bursting = True
+        self.burst_last_seq = 0
+        self.burst_button.config(text="Stop Burst")
+        self.burst_step()
+        self.update_progress()
+
+    def burst_step(self):
+        # Save every new frame from the capture thread, at most one per BURST_INTERVAL_MS
+        if not self.bursting or not self.capture:
+            self.bursting = False
+            self.burst_button.config(text="Start Burst")
+            return
+        item = self.capture.read_latest(self.burst_last_seq, timeout=0)
+        if item is not None:
+            self.burst_last_seq, _, frame = item
+            self.writer.save(frame, self.burst_folder)
+        self.root.after(BURST_INTERVAL_MS, self.burst_step)
+
+    def update_progress(self):
+        if self.progress_scheduled:
+            return
+        self.status_label.config(text=self.writer.progress())
+        if self.bursting or self.writer.pending:
+            self.progress_scheduled = True
+            self.root.after(200, self.poll_progress)
+
+    def poll_progress(self):
+        self.progress_scheduled = False
+        self.update_progress()
 
     def on_closing(self):
-        if self.cap:
-            self.cap.release()
+        self.bursting = False
+        self.display.stop()
+        self.stop_camera()
+        # Let queued images finish writing
+        self.writer.shutdown()
         self.root.destroy()
 
 
@@ -0,0 +1,158 @@
+import itertools
+import queue
+import threading
+import time
+
+import serial
+
+from metrics import NULL_METRICS
+
+# Lower number = sent first
+PRIORITY_CRITICAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3
+
+# Default priority per event type
+EVENT_PRIORITIES = {
+    'gun': PRIORITY_CRITICAL,
+    'unknown_face': PRIORITY_NORMAL,
+}
+
+
+class AlertDispatcher:
+    """
+    Sends alerts to a serial alarm controller from its own writer thread.
+
+    `alert` never blocks: it drops the alert into a bounded priority queue and
+    returns. Alerts of the same event type and camera are coalesced: while one
+    is queued, or within `coalesce_window` seconds after one was sent, further
+    ones are only counted. When a write fails the connection is closed and
+    re-opened with `connect_fn` (after `reconnect_delay` seconds) and the
+    alert is retried.
+
+    For testing without hardware, pass a loopback stand-in, e.g.
+    `AlertDispatcher(lambda: serial.serial_for_url('loop://'))`, or a pty opened
+    with os.openpty().
+    """
+
+    def __init__(self, connect_fn, connection=None, coalesce_window=5.0, max_queue=64, reconnect_delay=2.0,
+                 metrics=None):
+        self.connect_fn = connect_fn
+        self.connection = connection
+        self.coalesce_window = coalesce_window
+        self.reconnect_delay = reconnect_delay
+        self.metrics = metrics or NULL_METRICS
+
+        self._queue = queue.PriorityQueue(maxsize=max_queue)
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last_sent = {}
+        self._stop_event = threading.Event()
+        self.running = True
+
+        # Statistics
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.connections_opened = 0
+        self.metrics.gauge('alert_queue_depth', self._queue.qsize)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def for_serial(cls, port, baudrate=9600, connection=None, **kwargs):
+        """Creates a dispatcher that (re)connects to the given serial port."""
+        return cls(lambda: serial.Serial(port, baudrate=baudrate, timeout=1, write_timeout=1),
+                   connection=connection, **kwargs)
+
+    def alert(self, event, message, camera=None, priority=None):
+        """
+        Queues an alert without blocking.
+
+        Args:
+            event (str): Event type, e.g. 'gun'; used for coalescing and the default priority.
+            message (str): Text written to the controller (a newline is appended).
+            camera: Camera the event comes from; alerts of different cameras are not coalesced.
+            priority (int): Overrides the event's default priority.
+
+        Returns:
+            bool: True if the alert was queued, False if it was coalesced or dropped.
+        """
+        key = (event, camera)
+        now = time.monotonic()
+        with self._lock:
+            last_sent = self._last_sent.get(key)
+            if key in self._pending or (last_sent is not None and now - last_sent < self.coalesce_window):
+                self.coalesced += 1
+                return False
+
+            if priority is None:
+                priority = EVENT_PRIORITIES.get(event, PRIORITY_NORMAL)
+            try:
+                self._queue.put_nowait((priority, next(self._order), key, message))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending.add(key)
+            return True
+
+    def _connect(self):
+        try:
+            self.connection = self.connect_fn()
+            self.connections_opened += 1
+            return True
+        except (serial.SerialException, OSError) as e:
+            print(f"Alert connection failed: {e}")
+            return False
+
+    def _send(self, message):
+        if self.connection is None and not self._connect():
+            return False
+        try:
+            with self.metrics.time('alert_write'):
+                self.connection.write(f"{message}\n".encode())
+            return True
+        except (serial.SerialException, OSError) as e:
+            print(f"Alert write failed, reconnecting: {e}")
+            try:
+                self.connection.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.connection = None
+            return False
+
+    def _run(self):
+        while self.running:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            priority, order, key, message = item
+            delivered = self._send(message)
+            # Waiting on the stop event lets stop() end a retry right away
+            while not delivered and not self._stop_event.wait(self.reconnect_delay):
+                delivered = self._send(message)
+
+            with self._lock:
+                self._pending.discard(key)
+                if delivered:
+                    self._last_sent[key] = time.monotonic()
+                    self.sent += 1
+
+    def stop(self, timeout=2.0):
+        """Stops the writer after giving queued alerts up to `timeout` seconds to go out."""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.running = False
+        self._stop_event.set()
+        # The writer owns the connection until it has finished its current write; that is bounded by
+        # the port's write timeout, so wait for it instead of closing the port underneath it
+        self._thread.join()
+        if self.connection:
+            self.connection.close()
+            self.connection = None
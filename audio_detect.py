@@ -1,69 +1,54 @@
+import os
+
+import joblib
 import librosa
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
 
-# Load and extract features from audio files
+# Classifier written by audio_train.py
+MODEL_PATH = "audio_model.joblib"
+
+# FFT window of the MFCC frames, the librosa default that audio_stream.IncrementalMFCC also uses
+N_FFT = 2048
+
+# Load and extract features from audio files.
+# Frames are not centered (center=False, no padding at the clip edges): that is the framing of the
+# streaming detector, so the model is trained on the same features it classifies in real time
 def extract_features(file_path):
     y, sr = librosa.load(file_path, sr=None)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    if len(y) < N_FFT:
+        y = np.pad(y, (0, N_FFT - len(y)))  # A clip shorter than one frame still gives one
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13, n_fft=N_FFT, center=False)
     mfcc_mean = np.mean(mfcc.T, axis=0)  # Take the mean of MFCC coefficients
     return mfcc_mean
 
-# Example dataset (replace these with your file paths)
-scream_files = ['scream1.wav', 'scream2.wav']
-gunshot_files = ['gunshot1.wav', 'gunshot2.wav']
-background_files = ['background1.wav', 'background2.wav']
-
-# Prepare dataset
-X = []
-y = []
-
-for file in scream_files:
-    features = extract_features(file)
-    X.append(features)
-    y.append('scream')
+# Load the trained classifier (train it with `python audio_train.py`)
+def load_model(path=MODEL_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No trained audio model at {path}, run audio_train.py first.")
+    return joblib.load(path)
 
-for file in gunshot_files:
-    features = extract_features(file)
-    X.append(features)
-    y.append('gunshot')
-
-for file in background_files:
-    features = extract_features(file)
-    X.append(features)
-    y.append('background')
-
-# Convert to numpy array
-X = np.array(X)
-y = np.array(y)
+# Real-time prediction
+from audio_stream import MicrophoneSource, StreamingDetector, WavFileSource
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Train a classifier
-model = RandomForestClassifier()
-model.fit(X_train, y_train)
+def real_time_detection(duration=None, sr=22050, window=2.0, hop=0.25, wav_file=None, model=None):
+    """
+    Continuously classifies sound from the microphone (or a WAV file for testing).
 
-# Test the model
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Accuracy: {accuracy:.2f}")
+    A `window`-second sliding window is classified every `hop` seconds, so no
+    audio between recordings is lost and detections arrive within one hop.
+    Runs until `duration` seconds of audio were processed (forever if None).
+    Uses the saved model from audio_train.py unless a model is given.
+    """
+    model = model if model is not None else load_model()
+    source = WavFileSource(wav_file, sr=sr) if wav_file else MicrophoneSource(sr=sr)
 
-# Real-time prediction
-import sounddevice as sd
+    def on_detection(stream_time, label):
+        print(f"[{stream_time:7.2f}s] Detected Sound: {label}")
 
-def real_time_detection(duration=2, sr=22050):
-    print("Recording...")
-    audio = sd.rec(int(duration * sr), samplerate=sr, channels=1)
-    sd.wait()
-    print("Recording finished.")
-    audio = audio.flatten()
-    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
-    mfcc_mean = np.mean(mfcc.T, axis=0).reshape(1, -1)
-    prediction = model.predict(mfcc_mean)
-    print(f"Detected Sound: {prediction[0]}")
+    print("Listening...")
+    detector = StreamingDetector(model, sr=sr, window=window, hop=hop, on_detection=on_detection)
+    return detector.run(source, duration)
 
 # Uncomment the line below to test real-time detection
-# real_time_detection()
\ No newline at end of file
+# real_time_detection()
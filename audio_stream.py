@@ -0,0 +1,278 @@
+import threading
+import time
+from collections import deque
+
+import librosa
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-size float32 sample buffer shared between an audio callback and a reader.
+
+    Samples are addressed by their absolute position in the stream, so the reader
+    can ask for everything written since the last position it processed. If the
+    reader falls more than `capacity` samples behind, the oldest samples are lost
+    (unless the writer asked to block, which only file sources do).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.total_written = 0
+        self.read_position = 0
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self._condition = threading.Condition()
+
+    def write(self, samples, block=False, timeout=0.5):
+        """
+        Appends samples; safe to call from the sounddevice callback thread.
+
+        With `block`, waits up to `timeout` seconds for the reader to make room
+        instead of overwriting unread samples, and returns False if it did not.
+        """
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        length = len(samples)
+        # A write longer than the buffer keeps only its tail, but the stream still advances by the whole
+        # write, so the reader sees the dropped head as lost samples instead of a shifted position
+        samples = samples[-self.capacity:]
+        with self._condition:
+            if block and not self._condition.wait_for(
+                    lambda: self.total_written + len(samples) - self.read_position <= self.capacity, timeout):
+                return False
+            start = (self.total_written + length - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._buffer[start:start + first] = samples[:first]
+            self._buffer[:len(samples) - first] = samples[first:]
+            self.total_written += length
+            self._condition.notify_all()
+        return True
+
+    def wait_for(self, position, timeout=None):
+        """Waits until the stream has reached the given absolute position."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.total_written >= position, timeout)
+
+    def read_since(self, position):
+        """
+        Returns (start, samples) for everything written from `position` on.
+
+        `start` is larger than `position` when samples were overwritten before they were read.
+        """
+        with self._condition:
+            end = self.total_written
+            start = max(position, end - self.capacity)
+            indices = np.arange(start, end) % self.capacity
+            self.read_position = end
+            self._condition.notify_all()
+            return start, self._buffer[indices]
+
+
+class IncrementalMFCC:
+    """
+    Computes MFCC features of a stream without processing overlapping audio twice.
+
+    New samples are turned into mel power frames as soon as a full FFT window is
+    available; only the samples still needed by the next frame are kept around.
+    The MFCCs of a window are then derived from the stored mel frames (dB scaling
+    and DCT only), which matches running librosa.feature.mfcc(..., center=False)
+    on that window. Frames are never centered (padded at the window edges) since
+    the samples before and after a window are real audio, not silence;
+    audio_detect.extract_features uses the same framing for the training clips.
+    """
+
+    def __init__(self, sr, n_mfcc=13, n_fft=2048, hop_length=512, max_frames=256):
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.frames = deque(maxlen=max_frames)
+        self.frames_computed = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def update(self, samples):
+        """Feeds new samples and returns how many new frames were computed."""
+        buffer = np.concatenate([self._pending, np.asarray(samples, dtype=np.float32)])
+        if len(buffer) < self.n_fft:
+            self._pending = buffer
+            return 0
+
+        n_frames = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        used = (n_frames - 1) * self.hop_length + self.n_fft
+        mel = librosa.feature.melspectrogram(y=buffer[:used], sr=self.sr, n_fft=self.n_fft,
+                                             hop_length=self.hop_length, center=False)
+        self.frames.extend(mel.T)
+        self.frames_computed += n_frames
+
+        # The next frame starts right after the last hop that was consumed
+        self._pending = buffer[n_frames * self.hop_length:]
+        return n_frames
+
+    def reset(self):
+        """Forgets all frames, e.g. after samples were lost."""
+        self.frames.clear()
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def window_features(self, n_frames):
+        """Returns the mean MFCC vector of the last `n_frames` frames, or None if there are fewer."""
+        if len(self.frames) < n_frames:
+            return None
+        mel = np.stack(list(self.frames)[-n_frames:], axis=1)
+        mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=self.n_mfcc)
+        return np.mean(mfcc.T, axis=0)
+
+
+class MicrophoneSource:
+    """Continuous microphone input through a sounddevice.InputStream callback."""
+
+    def __init__(self, sr=22050, blocksize=1024, device=None):
+        self.sr = sr
+        self.blocksize = blocksize
+        self.device = device
+        self.finished = False
+        self._stream = None
+
+    def start(self, on_audio):
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            if status:
+                print(f"Audio input: {status}")
+            on_audio(indata[:, 0])
+
+        self._stream = sd.InputStream(samplerate=self.sr, blocksize=self.blocksize, channels=1,
+                                      dtype='float32', device=self.device, callback=callback)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self.finished = True
+
+
+class WavFileSource:
+    """
+    Plays a WAV file into the detector in place of the microphone, for testing.
+
+    With `realtime` the blocks are delivered at the pace of the audio, otherwise
+    as fast as the detector consumes them (without ever dropping samples).
+    """
+
+    def __init__(self, path, sr=22050, blocksize=1024, realtime=True):
+        self.path = path
+        self.sr = sr
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.finished = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, on_audio):
+        audio, _ = librosa.load(self.path, sr=self.sr, mono=True)
+
+        def play():
+            started = time.monotonic()
+            for offset in range(0, len(audio), self.blocksize):
+                block = audio[offset:offset + self.blocksize]
+                if not self.realtime:
+                    while not self._stop_event.is_set() and not on_audio(block, block=True):
+                        pass
+                if self._stop_event.is_set():
+                    break
+                if self.realtime:
+                    on_audio(block)
+                    delay = started + (offset + self.blocksize) / self.sr - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+            self.finished = True
+
+        self._thread = threading.Thread(target=play, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self.finished = True
+
+
+class StreamingDetector:
+    """
+    Classifies a continuous audio stream with overlapping sliding windows.
+
+    The audio source only writes into a ring buffer; a reader loop pulls the new
+    samples, updates the MFCC frames incrementally and classifies the last
+    `window` seconds every `hop` seconds.
+    """
+
+    def __init__(self, model, sr=22050, window=2.0, hop=0.25, n_mfcc=13, hop_length=512,
+                 buffer_seconds=10.0, on_detection=None):
+        self.model = model
+        self.sr = sr
+        self.hop_samples = int(hop * sr)
+        self.window_frames = int(window * sr) // hop_length
+        self.ring = RingBuffer(int(buffer_seconds * sr))
+        self.features = IncrementalMFCC(sr, n_mfcc=n_mfcc, hop_length=hop_length,
+                                        max_frames=self.window_frames)
+        self.on_detection = on_detection
+        self.running = False
+        self.lost_samples = 0
+
+    def classify_window(self):
+        """Returns the label for the current window, or None while the window is still filling."""
+        features = self.features.window_features(self.window_frames)
+        if features is None:
+            return None
+        return self.model.predict(features.reshape(1, -1))[0]
+
+    def run(self, source, duration=None):
+        """
+        Streams from the source until stopped, the source ends or `duration` seconds passed.
+
+        Returns:
+            list: (stream_time_in_seconds, label) for every classified window.
+        """
+        self.running = True
+        detections = []
+        position = 0
+        source.start(self.ring.write)
+        try:
+            while self.running:
+                if duration is not None and position >= duration * self.sr:
+                    break
+                if not self.ring.wait_for(position + self.hop_samples, timeout=0.5):
+                    if source.finished and self.ring.total_written <= position:
+                        break
+                    if not source.finished:
+                        continue
+
+                start, samples = self.ring.read_since(position)
+                if start > position:
+                    # The reader fell behind and lost audio: restart the window
+                    self.lost_samples += start - position
+                    self.features.reset()
+
+                # Classify once per hop boundary, even if the reader picked up several hops at once
+                offset = 0
+                while offset < len(samples):
+                    boundary = ((start + offset) // self.hop_samples + 1) * self.hop_samples
+                    chunk = samples[offset:boundary - start]
+                    self.features.update(chunk)
+                    offset += len(chunk)
+                    position = start + offset
+                    if position % self.hop_samples:
+                        continue
+
+                    label = self.classify_window()
+                    if label is not None:
+                        detections.append((position / self.sr, label))
+                        if self.on_detection:
+                            self.on_detection(position / self.sr, label)
+        finally:
+            source.stop()
+            self.running = False
+        return detections
+
+    def stop(self):
+        self.running = False
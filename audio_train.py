@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from audio_detect import MODEL_PATH, extract_features
+
+# Per-file MFCC vectors are cached here, keyed by the hash of the file content
+FEATURE_CACHE_DIR = ".audio_feature_cache"
+
+# Bump when extract_features changes so cached vectors are recomputed
+FEATURE_VERSION = 2
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg")
+
+# Example dataset used when no dataset directory is given (replace these with your file paths)
+EXAMPLE_DATASET = {
+    'scream': ['scream1.wav', 'scream2.wav'],
+    'gunshot': ['gunshot1.wav', 'gunshot2.wav'],
+    'background': ['background1.wav', 'background2.wav'],
+}
+
+
+def list_dataset(dataset_dir):
+    """Returns {label: [file paths]} for a directory with one sub-folder of clips per label."""
+    dataset = {}
+    for label in sorted(os.listdir(dataset_dir)):
+        label_dir = os.path.join(dataset_dir, label)
+        if not os.path.isdir(label_dir) or label.startswith('.'):
+            continue
+        dataset[label] = [os.path.join(label_dir, filename) for filename in sorted(os.listdir(label_dir))
+                          if filename.lower().endswith(AUDIO_EXTENSIONS)]
+    return dataset
+
+
+def cache_path(file_path, cache_dir):
+    sha1 = hashlib.sha1(f"v{FEATURE_VERSION}:".encode())
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return os.path.join(cache_dir, sha1.hexdigest() + ".npy")
+
+
+def extract_and_cache(file_path, feature_path):
+    """Worker: extracts the features of one file and stores them in the cache."""
+    features = extract_features(file_path)
+    # Write under a temporary name so a killed worker never leaves a partial file behind
+    tmp_path = feature_path + ".tmp.npy"
+    np.save(tmp_path, features)
+    os.replace(tmp_path, feature_path)
+    return features
+
+
+def load_features(files, cache_dir=FEATURE_CACHE_DIR, workers=None):
+    """
+    Returns the feature vectors of the given files, in order.
+
+    Cached vectors are read from disk; only new or modified files are decoded,
+    in parallel across `workers` processes.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    feature_paths = [cache_path(file_path, cache_dir) for file_path in files]
+
+    features = [None] * len(files)
+    missing = []
+    for i, feature_path in enumerate(feature_paths):
+        if os.path.exists(feature_path):
+            features[i] = np.load(feature_path)
+        else:
+            missing.append(i)
+
+    print(f"{len(files) - len(missing)} cached, extracting features of {len(missing)} files...")
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(extract_and_cache, [files[i] for i in missing],
+                               [feature_paths[i] for i in missing], chunksize=8)
+            for i, result in zip(missing, results):
+                features[i] = result
+    return features
+
+
+def train(dataset, model_path=MODEL_PATH, cache_dir=FEATURE_CACHE_DIR, workers=None):
+    """Extracts features, fits the classifier and saves it to `model_path`."""
+    files = []
+    y = []
+    for label, label_files in dataset.items():
+        files.extend(label_files)
+        y.extend([label] * len(label_files))
+
+    # Convert to numpy array
+    X = np.array(load_features(files, cache_dir, workers))
+    y = np.array(y)
+
+    # Train-test split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Train a classifier
+    model = RandomForestClassifier(n_jobs=-1)
+    model.fit(X_train, y_train)
+
+    # Test the model
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"Accuracy: {accuracy:.2f}")
+
+    joblib.dump(model, model_path)
+    print(f"Model saved to {model_path}")
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the audio event classifier.")
+    parser.add_argument('--dataset', help="Directory with one sub-folder of audio clips per label")
+    parser.add_argument('--model', default=MODEL_PATH, help="Where to save the trained model")
+    parser.add_argument('--cache-dir', default=FEATURE_CACHE_DIR, help="Feature cache directory")
+    parser.add_argument('--workers', type=int, default=None, help="Feature extraction processes")
+    args = parser.parse_args()
+
+    dataset = list_dataset(args.dataset) if args.dataset else EXAMPLE_DATASET
+    train(dataset, args.model, args.cache_dir, args.workers)
+
+
+if __name__ == "__main__":
+    main()
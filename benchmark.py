@@ -0,0 +1,435 @@
+"""
+Offline replay benchmark for detection, face recognition and the full pipeline.
+
+Frames are loaded into memory first (from a video file, an image folder or a
+deterministic synthetic clip), so decoding is not part of the measurement.
+Each benchmark is repeated a few times and reports the median throughput and
+latency percentiles over the runs; results can be saved as a JSON baseline and
+compared against a previous run of the same setup (models, backends, frames).
+
+With `--models stub` no model weights (and neither ultralytics nor
+face_recognition) are needed: the stub detector and recognizer are
+deterministic and do a fixed amount of real work, so the harness can run on CI.
+
+Usage:
+    python benchmark.py --models stub --save-baseline baseline.json
+    python benchmark.py --models stub --compare baseline.json
+    python benchmark.py --source videos/lobby.mp4 --models real --compare lobby_baseline.json
+    python benchmark.py --models real --backend ultralytics onnx openvino --bench detect
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from face_gallery import ENCODING_SIZE, FaceGallery
+from face_recognition_module import draw_faces
+from frame_pipeline import CameraCapture, FramePipeline
+from gun_and_human_detection import TARGET_CLASSES, Detections
+from metrics import CameraMetrics, QUANTILES
+
+BENCHMARKS = ('detect', 'recognize', 'pipeline')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# A benchmark regresses when its mean or median latency grows, or the throughput drops, by more than this;
+# tail percentiles (p90 and above) rest on a few samples and get their own, looser tolerance
+DEFAULT_TOLERANCE = 0.10
+DEFAULT_TAIL_TOLERANCE = 1.0
+# Slowdowns smaller than this (per call, or per frame for throughput) are timer and scheduler noise
+MIN_REGRESSION_MS = 1.0
+# Every benchmark runs this many times and reports the median of each value
+DEFAULT_REPEAT = 5
+# A baseline is only comparable when these report fields match
+COMPARABLE_FIELDS = ('models', 'backends', 'resolution', 'frames')
+
+
+def synthetic_frames(count=120, width=640, height=480):
+    """Deterministic clip: two bright 'people' walking over a dark, noisy background."""
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 40, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for offset, speed in ((0, 3), (width // 2, -2)):
+            x = (offset + i * speed) % (width - 80)
+            cv2.rectangle(frame, (x, height // 4), (x + 80, height // 4 + 220), (200, 200, 200), -1)
+            cv2.circle(frame, (x + 40, height // 4 + 30), 22, (160, 170, 230), -1)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(source=None, max_frames=300, synthetic=120):
+    """Returns the frames of a video file or image folder, or a synthetic clip when `source` is None."""
+    if source is None:
+        return synthetic_frames(synthetic)
+
+    frames = []
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS) and len(frames) < max_frames:
+                frame = cv2.imread(os.path.join(source, filename))
+                if frame is not None:
+                    frames.append(frame)
+    else:
+        cap = cv2.VideoCapture(source)
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+    if not frames:
+        raise ValueError(f"No frames could be read from {source}")
+    return frames
+
+
+def stub_detect(frame, imgsz=None):
+    """
+    Deterministic stand-in for `detect_objects`.
+
+    Bright blobs on a downscaled, thresholded copy become 'person' detections,
+    so the result depends on the frame and the cost scales with its size.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    scale = (imgsz or 640) / float(max(gray.shape))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, mask = cv2.threshold(cv2.GaussianBlur(small, (5, 5), 0), 100, 255, cv2.THRESH_BINARY)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+
+    x, y, w, h, area = stats[1:count][stats[1:count, 4] >= 200].T
+    boxes = np.stack([x, y, x + w, y + h], axis=1) / scale
+    detections = Detections(boxes, np.minimum(1.0, area / (w * h).astype(np.float32)),
+                            np.full(len(area), TARGET_CLASSES['person']))
+    return detections, frame
+
+
+class StubRecognizer:
+    """
+    Deterministic stand-in for `recognize_faces`.
+
+    The face is assumed at the top of each person box (or the frame center); its
+    'encoding' is a normalized 8x16 thumbnail, matched with the real FaceGallery
+    against `gallery_size` seeded random entries.
+    """
+
+    def __init__(self, gallery_size=1000, tolerance=0.6):
+        rng = np.random.default_rng(1)
+        encodings = rng.normal(0.0, 0.1, (gallery_size, ENCODING_SIZE)).astype(np.float32)
+        self.gallery = FaceGallery(encodings, [f"person_{i}" for i in range(gallery_size)])
+        self.tolerance = tolerance
+
+    def recognize(self, frame, person_boxes=None, draw=False):
+        height, width = frame.shape[:2]
+        if person_boxes is None:
+            person_boxes = [(width // 4, height // 4, width * 3 // 4, height * 3 // 4)]
+
+        locations, encodings = [], []
+        for x1, y1, x2, y2 in person_boxes:
+            size = max(1, min(x2 - x1, (y2 - y1) // 2))
+            top, left = max(0, y1), max(0, x1 + (x2 - x1 - size) // 2)
+            crop = frame[top:top + size, left:left + size]
+            if crop.size == 0:
+                continue
+            thumbnail = cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (8, 16), interpolation=cv2.INTER_AREA)
+            encoding = thumbnail.astype(np.float32).ravel()
+            encoding -= encoding.mean()
+            encoding /= np.linalg.norm(encoding) or 1.0
+            locations.append((top, left + size, top + size, left))
+            encodings.append(encoding)
+
+        faces = [{'name': name, 'location': location, 'distance': distance, 'encoding': encoding}
+                 for (name, distance), location, encoding
+                 in zip(self.gallery.match(encodings, self.tolerance) if encodings else [], locations, encodings)]
+        return faces, draw_faces(frame, faces) if draw else frame
+
+
+def load_models(kind, backend=None, weights=None):
+    """Returns (detect_fn, recognize_fn) for 'stub' or 'real' models, optionally on another detector backend."""
+    if kind == 'stub':
+        return stub_detect, StubRecognizer().recognize
+    # Imported here so stub runs need neither the model weights nor the libraries
+    import gun_and_human_detection
+    from face_recognition_module import recognize_faces
+    if backend:
+        gun_and_human_detection.set_backend(backend, weights)
+    return gun_and_human_detection.detect_objects, recognize_faces
+
+
+def summarize(latencies, frames, seconds):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    result = {
+        'frames': frames,
+        'seconds': seconds,
+        'throughput_fps': frames / seconds if seconds > 0 else 0.0,
+    }
+    if len(latencies):
+        result['mean_ms'] = float(latencies.mean() * 1000)
+        for q, value in zip(QUANTILES, np.quantile(latencies, QUANTILES)):
+            result[f"p{int(q * 100)}_ms"] = float(value * 1000)
+    return result
+
+
+def benchmark_calls(fn, frames, warmup=3, frame_args=None, **kwargs):
+    """
+    Calls `fn(frame, *args, **kwargs)` on every frame in turn and measures each call.
+
+    The frames are passed as they are, like the pipeline does, so `fn` must not draw on them.
+    """
+    frame_args = frame_args or [()] * len(frames)
+    for frame, args in list(zip(frames, frame_args))[:warmup]:
+        fn(frame, *args, **kwargs)
+
+    latencies = []
+    started = time.perf_counter()
+    for frame, args in zip(frames, frame_args):
+        call_started = time.perf_counter()
+        fn(frame, *args, **kwargs)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, len(frames), time.perf_counter() - started)
+
+
+class ReplayVideo:
+    """Minimal cv2.VideoCapture stand-in that replays frames from memory at a fixed rate."""
+
+    def __init__(self, frames, fps=30.0):
+        self.frames = frames
+        self.interval = 1.0 / fps if fps else 0.0
+        self.index = 0
+        self._next_time = None
+
+    def isOpened(self):
+        return self.index < len(self.frames)
+
+    def read(self):
+        if self.index >= len(self.frames):
+            return False, None
+        if self.interval:
+            now = time.perf_counter()
+            self._next_time = now if self._next_time is None else self._next_time + self.interval
+            if self._next_time > now:
+                time.sleep(self._next_time - now)
+        frame = self.frames[self.index]
+        self.index += 1
+        return True, frame
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.index = len(self.frames)
+
+
+def benchmark_pipeline(detect_fn, recognize_fn, frames, fps=30.0):
+    """
+    Replays the frames at `fps` through the full FramePipeline.
+
+    The pipeline skips frames it cannot keep up with, so besides the render
+    rate this reports how many frames were detected and the capture-to-result
+    latency of detection and recognition.
+    """
+    metrics = CameraMetrics('benchmark', window=len(frames) * 2)
+    capture = CameraCapture(ReplayVideo(frames, fps), metrics=metrics)
+    pipeline = FramePipeline(capture, detect_fn, recognize_fn, faces_in_people=True, metrics=metrics)
+
+    started = time.perf_counter()
+    pipeline.start()
+    rendered = sum(1 for _ in pipeline.frames())
+    pipeline.stop()
+    seconds = time.perf_counter() - started
+
+    stages = metrics.snapshot()['stages']
+    detect = stages.get('detect', {'count': 0})
+    result = {
+        'frames': rendered,
+        'seconds': seconds,
+        'throughput_fps': rendered / seconds if seconds > 0 else 0.0,
+        'detected_frames': detect['count'],
+        'detect_fps': detect['count'] / seconds if seconds > 0 else 0.0,
+        'dropped_frames': pipeline.dropped_frames,
+    }
+    for stage in ('detect_latency', 'recognize_latency'):
+        if stage in stages:
+            for q in QUANTILES:
+                result[f"{stage}_p{int(q * 100)}_ms"] = stages[stage][f"p{int(q * 100)}"] * 1000
+    return result
+
+
+def median_result(runs):
+    """Combines the results of repeated runs of one benchmark into the median of every value."""
+    combined = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if key in run]
+        median = float(np.median(values))
+        combined[key] = int(round(median)) if all(isinstance(value, int) for value in values) else median
+    combined['runs'] = len(runs)
+    return combined
+
+
+def repeated(benchmark, repeat):
+    """Runs `benchmark()` `repeat` times and returns the median result."""
+    return median_result([benchmark() for _ in range(max(1, repeat))])
+
+
+def run_benchmarks(frames, models='stub', benchmarks=BENCHMARKS, warmup=3, fps=30.0, backends=(), weights=(),
+                   repeat=DEFAULT_REPEAT):
+    """
+    Runs every benchmark `repeat` times and returns the report of the medians.
+
+    With several detector `backends` (real models only) detection is measured
+    once per backend, as 'detect[<backend>]' with its speedup over the first;
+    the other benchmarks then run on the first backend.
+    """
+    backends = list(backends) if models == 'real' else []
+    weights = list(weights) + [None] * (len(backends) - len(weights))
+    height, width = frames[0].shape[:2]
+    report = {
+        'models': models,
+        'backends': backends,
+        'frames': len(frames),
+        'resolution': f"{width}x{height}",
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': {},
+    }
+
+    if 'detect' in benchmarks and len(backends) > 1:
+        # The first backend is measured last, so it is the one the remaining benchmarks use
+        for backend, backend_weights in reversed(list(zip(backends, weights))):
+            detect_fn, recognize_fn = load_models(models, backend, backend_weights)
+            report['results'][f"detect[{backend}]"] = repeated(
+                lambda: benchmark_calls(detect_fn, frames, warmup), repeat)
+        reference = report['results'][f"detect[{backends[0]}]"]['throughput_fps']
+        for backend in backends:
+            result = report['results'][f"detect[{backend}]"]
+            result['speedup'] = result['throughput_fps'] / reference if reference else 0.0
+    else:
+        detect_fn, recognize_fn = load_models(models, backends[0] if backends else None,
+                                              weights[0] if backends else None)
+        if 'detect' in benchmarks:
+            report['results']['detect'] = repeated(lambda: benchmark_calls(detect_fn, frames, warmup), repeat)
+    if 'recognize' in benchmarks:
+        # Recognition runs on the person boxes like in the apps, so detect them up front
+        boxes = [(detect_fn(frame)[0].boxes_of('person'),) for frame in frames]
+        report['results']['recognize'] = repeated(
+            lambda: benchmark_calls(recognize_fn, frames, warmup, boxes, draw=False), repeat)
+    if 'pipeline' in benchmarks:
+        report['results']['pipeline'] = repeated(
+            lambda: benchmark_pipeline(detect_fn, recognize_fn, frames, fps), repeat)
+    return report
+
+
+def _is_tail(key):
+    """Whether a result key is a tail percentile such as 'p95_ms' or 'detect_latency_p99_ms'."""
+    percentile = key[:-len('_ms')].rsplit('_', 1)[-1]
+    return percentile.startswith('p') and percentile[1:].isdigit() and int(percentile[1:]) >= 90
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE, tail_tolerance=DEFAULT_TAIL_TOLERANCE,
+            min_regression_ms=MIN_REGRESSION_MS):
+    """
+    Returns a list of regression messages of `report` against `baseline`.
+
+    A value regresses when it is worse by more than its relative tolerance and,
+    in time per call or per frame, by more than `min_regression_ms`.
+
+    Raises:
+        ValueError: If the baseline was measured on another setup (see COMPARABLE_FIELDS).
+    """
+    mismatches = [f"{field} {baseline.get(field)!r} vs {report.get(field)!r}"
+                  for field in COMPARABLE_FIELDS if baseline.get(field) != report.get(field)]
+    if mismatches:
+        raise ValueError("The baseline was measured on another setup: " + ", ".join(mismatches))
+
+    regressions = []
+    for name, result in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for key, value in result.items():
+            old = previous.get(key)
+            if not old or not isinstance(value, (int, float)):
+                continue
+            allowed = tail_tolerance if key.endswith('_ms') and _is_tail(key) else tolerance
+            if key.endswith('_ms') and value > old * (1 + allowed) and value - old > min_regression_ms:
+                regressions.append(f"{name} {key}: {old:.2f} -> {value:.2f} ms (+{value / old - 1:.0%})")
+            elif (key.endswith('fps') and value < old * (1 - allowed)
+                  and (value <= 0 or 1000.0 / value - 1000.0 / old > min_regression_ms)):
+                regressions.append(f"{name} {key}: {old:.2f} -> {value:.2f} fps ({value / old - 1:.0%})")
+    return regressions
+
+
+def format_report(report):
+    lines = [f"{report['frames']} frames at {report['resolution']}, {report['models']} models, "
+             f"median of {report.get('repeat', 1)} runs"]
+    for name, result in report['results'].items():
+        text = f"  {name:<10} {result['throughput_fps']:8.1f} fps"
+        percentiles = [f"{key[:-3]} {value:.1f}" for key, value in result.items() if key.endswith('_ms')]
+        if percentiles:
+            text += "  (ms: " + ", ".join(percentiles) + ")"
+        if 'speedup' in result:
+            text += f"  {result['speedup']:.2f}x"
+        if 'dropped_frames' in result:
+            text += f"  detected {result['detected_frames']}, dropped {result['dropped_frames']}"
+        lines.append(text)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay frames through detection and recognition and time them.")
+    parser.add_argument('--source', help="Video file or image folder (default: a synthetic clip)")
+    parser.add_argument('--max-frames', type=int, default=300, help="Maximum number of frames to load")
+    parser.add_argument('--models', choices=('stub', 'real'), default='stub',
+                        help="Deterministic stub models or the real YOLO / face_recognition models")
+    parser.add_argument('--backend', nargs='+', default=[], choices=('ultralytics', 'onnx', 'openvino'),
+                        help="Detector backend(s) for real models; several are compared on detection")
+    parser.add_argument('--weights', nargs='+', default=[], help="Model file per backend (default: usual names)")
+    parser.add_argument('--bench', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS),
+                        help="Benchmarks to run")
+    parser.add_argument('--fps', type=float, default=30.0, help="Replay rate of the pipeline benchmark")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed calls before each benchmark")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="Runs per benchmark; the median of each value is reported")
+    parser.add_argument('--save-baseline', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown of throughput, mean and median latency")
+    parser.add_argument('--tail-tolerance', type=float, default=DEFAULT_TAIL_TOLERANCE,
+                        help="Allowed relative slowdown of p90 and higher latency percentiles")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.max_frames)
+    report = run_benchmarks(frames, args.models, args.bench, args.warmup, args.fps, args.backend, args.weights,
+                            args.repeat)
+    print(format_report(report))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare(report, baseline, args.tolerance, args.tail_tolerance)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
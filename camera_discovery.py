@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+
+import cv2
+
+# Cameras found by the last probe, so the next start can show them immediately
+CAMERA_CACHE_FILE = "camera_cache.json"
+
+
+def probe_camera(index):
+    """Opens a camera index and returns its metadata, or None if it does not deliver frames."""
+    cap = cv2.VideoCapture(index)
+    try:
+        ret, frame = cap.read()
+        if not ret:
+            return None
+        return {
+            'index': index,
+            'width': frame.shape[1],
+            'height': frame.shape[0],
+            'fps': cap.get(cv2.CAP_PROP_FPS) or None,
+            'backend': cap.getBackendName(),
+        }
+    finally:
+        cap.release()
+
+
+def describe_camera(camera):
+    """Returns the dropdown text for a camera, e.g. '0 - 1280x720 @ 30 fps'."""
+    text = f"{camera['index']} - {camera['width']}x{camera['height']}"
+    if camera.get('fps'):
+        text += f" @ {camera['fps']:.0f} fps"
+    return text
+
+
+def parse_camera_index(text):
+    """Returns the camera index at the start of a dropdown value, or None."""
+    first = str(text).split(' ', 1)[0]
+    return int(first) if first.isdigit() else None
+
+
+class CameraDiscovery:
+    """
+    Probes camera indices concurrently in the background.
+
+    Every index up to `max_index` is probed on its own thread, so gaps in the
+    numbering do not stop the search and one slow device does not delay the
+    others; devices that have not answered after `timeout` seconds are reported
+    as unavailable. Results are cached on disk, so `cameras` is filled from the
+    last run right away and updated once `refresh` finishes.
+
+    Opening a device that is already streaming can fail or disturb it, so
+    indices the caller has open are not probed and keep their last result. A
+    probe that timed out keeps its thread and the device until the driver
+    returns; that index is skipped by later refreshes while it is still running.
+    """
+
+    def __init__(self, max_index=10, timeout=3.0, cache_path=CAMERA_CACHE_FILE):
+        self.max_index = max_index
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.cameras = self._load_cache()
+        self.probing = False
+        self.last_refresh = None
+        self._lock = threading.Lock()
+        # index -> probe thread of the last refresh that probed it
+        self._probes = {}
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_cache(self):
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cameras, f, indent=2)
+        except OSError as e:
+            print(f"Warning: could not save camera cache: {e}")
+
+    def refresh(self, in_use=()):
+        """
+        Starts probing in the background; does nothing if a probe is already running.
+
+        `in_use` are the indices the caller has open, e.g. the camera the pipeline reads from.
+        """
+        with self._lock:
+            if self.probing:
+                return
+            self.probing = True
+        threading.Thread(target=self._probe_all, args=(set(in_use),), daemon=True).start()
+
+    def _probe_all(self, in_use):
+        previous = {camera['index']: camera for camera in self.cameras}
+        results = {}
+
+        def probe(index):
+            try:
+                results[index] = probe_camera(index)
+            except cv2.error:
+                results[index] = None
+
+        threads = []
+        for index in range(self.max_index):
+            stale = self._probes.get(index)
+            if index in in_use or (stale is not None and stale.is_alive()):
+                results[index] = previous.get(index)
+                continue
+            # Daemon threads, so a device that hangs forever cannot block shutdown
+            thread = threading.Thread(target=probe, args=(index,), daemon=True)
+            self._probes[index] = thread
+            threads.append(thread)
+            thread.start()
+        deadline = time.monotonic() + self.timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+        self.cameras = [results[i] for i in range(self.max_index) if results.get(i)]
+        self.last_refresh = time.time()
+        self._save_cache()
+        self.probing = False
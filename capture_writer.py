@@ -0,0 +1,73 @@
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+
+
+class CaptureWriter:
+    """
+    Saves captured frames as JPEG files on a background worker pool.
+
+    File names carry a millisecond timestamp and a sequence number, so fast or
+    burst captures never overwrite each other. Progress is available through
+    `progress()` for the UI to poll instead of showing a dialog per image.
+    """
+
+    def __init__(self, workers=2, jpeg_quality=95):
+        self.jpeg_quality = jpeg_quality
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture-writer")
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self.saved = 0
+        self.failed = 0
+        self.pending = 0
+        self.last_path = None
+
+    def save(self, frame, folder, prefix="captured_image"):
+        """
+        Queues a frame to be written to `folder` and returns the file path it will get.
+
+        The frame must not be modified afterwards (frames from the capture thread never are).
+        """
+        timestamp = datetime.now().strftime('%H-%M-%S-%f')[:-3]
+        image_filename = f"{prefix}_{timestamp}_{next(self._sequence):05d}.jpg"
+        file_path = os.path.join(folder, image_filename)
+        with self._lock:
+            self.pending += 1
+        self._pool.submit(self._write, frame, file_path)
+        return file_path
+
+    def _write(self, frame, file_path):
+        ok, error = False, None
+        try:
+            # cv2.imwrite releases the GIL while encoding, so several workers really run in parallel
+            ok = cv2.imwrite(file_path, frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        except Exception as e:  # e.g. cv2.error for an unsupported frame; count it and keep the worker
+            error = e
+        finally:
+            # Always settle the counter, the UI polls until nothing is pending
+            with self._lock:
+                self.pending -= 1
+                if ok:
+                    self.saved += 1
+                    self.last_path = file_path
+                else:
+                    self.failed += 1
+        if not ok:
+            print(f"Error: could not save {file_path}" + (f": {error}" if error else ""))
+
+    def progress(self):
+        """Returns a short status text, e.g. 'Saved 12 image(s), 3 pending'."""
+        with self._lock:
+            text = f"Saved {self.saved} image(s)"
+            if self.pending:
+                text += f", {self.pending} pending"
+            if self.failed:
+                text += f", {self.failed} failed"
+            return text
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,304 @@
+"""
+Headless multi-camera surveillance service.
+
+Runs one capture/detect/recognize pipeline per camera without Tk or a display.
+All cameras share one YOLO model (through a DetectionBatcher, so frames from
+different cameras are detected in one batched forward pass), the known-face
+gallery and the unknown-face store. A camera that stops delivering frames is
+restarted with exponential backoff; SIGINT/SIGTERM shut everything down cleanly.
+
+Usage:
+    python cctv_service.py --config cameras.json
+
+Example config:
+    {
+        "cameras": [
+            {"name": "entrance", "source": 0},
+            {"name": "lobby", "source": "rtsp://10.0.0.12/stream1",
+             "zones": [[[200, 300], [1080, 300], [1280, 720], [0, 720]]],
+             "exclude": [[[900, 300], [1080, 300], [1080, 450], [900, 450]]]},
+            {"name": "replay", "source": "videos/parking.mp4", "restart": false}
+        ],
+        "detector_backend": "openvino",
+        "detector_weights": "yolov8n_openvino_model",
+        "batch_size": 8,
+        "batch_wait": 0.02,
+        "motion_gate": true,
+        "record_clips": true,
+        "alert_port": "/dev/ttyUSB0",
+        "metrics_port": 9100,
+        "metrics_jsonl": "metrics.jsonl",
+        "gallery_reload_interval": 5.0
+    }
+
+Stage metrics are only collected when "metrics_port" (Prometheus text on
+http://127.0.0.1:<port>/metrics) or "metrics_jsonl" is set. Photos added to,
+changed in or removed from known_faces are picked up every
+"gallery_reload_interval" seconds (null: load them once).
+
+A camera may list "zones", polygons of [x, y] frame pixels where detections
+count, and "exclude", polygons cut out of them. Detection then only runs on
+the bounding crop of the zones, and people or guns outside them trigger
+neither face recognition nor alerts.
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+
+import cv2
+import gun_and_human_detection
+from gun_and_human_detection import DetectionBatcher
+from face_tracker import FaceTracker
+from frame_pipeline import CameraCapture, FramePipeline
+from motion_gate import MotionGate
+from alert_dispatcher import AlertDispatcher
+from clip_recorder import ClipRecorder
+from unknown_faces import UnknownFaceStore
+from metrics import MetricsExporter, MetricsRegistry
+from detection_zones import DetectionZones
+from model_warmup import ModelWarmup
+from gallery_watcher import GalleryWatcher
+
+# Print a per-camera status line every this many seconds
+STATUS_INTERVAL = 60.0
+
+
+def parse_source(source):
+    """Device indices may be given as numbers or digit strings; anything else is a file or URL."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+def load_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    cameras = config.get('cameras')
+    if not cameras:
+        raise ValueError(f"{path}: no cameras configured")
+    names = set()
+    for index, camera in enumerate(cameras):
+        if 'source' not in camera:
+            raise ValueError(f"{path}: camera {index} has no source")
+        camera.setdefault('name', f"camera{index}")
+        if camera['name'] in names:
+            raise ValueError(f"{path}: duplicate camera name {camera['name']!r}")
+        names.add(camera['name'])
+    return config
+
+
+class CameraWorker(threading.Thread):
+    """
+    Runs the pipeline of one camera and restarts it when the camera fails.
+
+    The restart delay doubles after every failure, up to `max_backoff` seconds,
+    and starts over once the camera has been running for longer than that.
+    """
+
+    def __init__(self, service, name, source, restart=True, min_backoff=1.0, max_backoff=60.0, zones=None):
+        super().__init__(name=f"camera-{name}", daemon=True)
+        self.service = service
+        self.camera_name = name
+        self.source = parse_source(source)
+        self.restart = restart
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.zones = zones
+
+        self.pipeline = None
+        self.metrics = service.metrics.camera(name)
+        self.restarts = 0
+        self.metrics.gauge('restarts', lambda: self.restarts)
+        self.recorder = None
+        if service.config.get('record_clips', True):
+            self.recorder = ClipRecorder(output_dir=os.path.join("clips", name))
+
+    def log(self, message):
+        print(f"[{self.camera_name}] {message}")
+
+    def run(self):
+        backoff = self.min_backoff
+        while not self.service.stopping.is_set():
+            started = time.monotonic()
+            try:
+                self._run_pipeline()
+            except (cv2.error, OSError, RuntimeError) as e:
+                self.log(f"Pipeline failed: {e}")
+
+            if self.service.stopping.is_set() or not self.restart:
+                break
+            if time.monotonic() - started > self.max_backoff:
+                backoff = self.min_backoff
+            self.log(f"Camera stopped, restarting in {backoff:.0f}s")
+            self.restarts += 1
+            self.service.stopping.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+        if self.recorder:
+            self.recorder.stop()
+        self.log("Stopped.")
+
+    def _run_pipeline(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            self.log(f"Error: Could not open {self.source!r}.")
+            return
+
+        motion_gate = MotionGate(verbose=False) if self.service.config.get('motion_gate', True) else None
+        # Tracking state is per camera; the gallery behind it is shared
+        face_tracker = FaceTracker()
+        self.pipeline = FramePipeline(CameraCapture(cap, metrics=self.metrics), self.service.batcher.detect,
+                                      face_tracker.recognize,
+                                      on_detections=self.handle_detections, on_faces=self.handle_faces,
+                                      motion_gate=motion_gate, faces_in_people=True, metrics=self.metrics,
+                                      zones=self.zones)
+        if self.service.stopping.is_set():
+            cap.release()
+            return
+        self.log(f"Started on {self.source!r}.")
+        self.pipeline.start()
+        try:
+            if self.recorder:
+                for _, annotated_frame in self.pipeline.frames():
+                    self.recorder.add_frame(annotated_frame)
+                    if self.service.stopping.is_set():
+                        break
+            else:
+                while self.pipeline.running and not self.pipeline.capture.finished:
+                    self.service.stopping.wait(0.5)
+        finally:
+            self.pipeline.stop()
+            cap.release()
+        if self.pipeline.error:
+            # Restarted like a failed camera
+            raise RuntimeError(self.pipeline.error)
+
+    def handle_detections(self, seq, detections):
+        if detections.has_label('gun'):
+            self.log(f"Gun detected in frame {seq}! Triggering alert...")
+            if self.recorder:
+                self.recorder.trigger('gun')
+            if self.service.alerts:
+                self.service.alerts.alert('gun', f"ALERT: Gun detected on {self.camera_name}!",
+                                          camera=self.camera_name)
+
+    def handle_faces(self, seq, faces, frame):
+        for face in faces:
+            if face['name'] != "Unknown":
+                continue
+            if self.recorder:
+                self.recorder.trigger('unknown_face')
+            if face['encoding'] is not None:
+                cluster_id, is_new = self.service.unknown_faces.add(face['encoding'], frame, face['location'])
+                if is_new:
+                    self.log(f"New unknown face, stored as {cluster_id}")
+
+    def status(self):
+        text = f"[{self.camera_name}] restarts: {self.restarts}"
+        if self.pipeline:
+            text += f", dropped frames: {self.pipeline.dropped_frames}"
+            if self.pipeline.motion_gate:
+                text += f", motion gate skipped {self.pipeline.motion_gate.skip_ratio:.0%}"
+        return text
+
+    def stop(self):
+        if self.pipeline:
+            self.pipeline.stop()
+
+
+class CCTVService:
+    """Owns the shared models and the camera workers."""
+
+    def __init__(self, config):
+        self.config = config
+        self.stopping = threading.Event()
+        if config.get('detector_backend'):
+            gun_and_human_detection.set_backend(config['detector_backend'], config.get('detector_weights'))
+        metrics_enabled = config.get('metrics_port') is not None or bool(config.get('metrics_jsonl'))
+        self.metrics = MetricsRegistry(enabled=metrics_enabled)
+        self.metrics_exporter = None
+        if self.metrics.enabled:
+            self.metrics_exporter = MetricsExporter(self.metrics, port=config.get('metrics_port'),
+                                                    jsonl_path=config.get('metrics_jsonl'),
+                                                    interval=config.get('metrics_interval', 10.0))
+        self.batcher = DetectionBatcher(max_batch_size=config.get('batch_size', len(config['cameras'])),
+                                        max_wait=config.get('batch_wait', 0.02))
+        self.unknown_faces = UnknownFaceStore()
+        self.warmup = ModelWarmup()
+        self.gallery_watcher = None
+        if config.get('gallery_reload_interval', 5.0):
+            self.gallery_watcher = GalleryWatcher(config.get('gallery_reload_interval', 5.0))
+        self.alerts = None
+        if config.get('alert_port'):
+            self.alerts = AlertDispatcher.for_serial(config['alert_port'], baudrate=config.get('alert_baudrate', 9600),
+                                                     metrics=self.metrics.camera('alerts'))
+        self.workers = [CameraWorker(self, camera['name'], camera['source'], restart=camera.get('restart', True),
+                                     max_backoff=config.get('max_backoff', 60.0),
+                                     zones=DetectionZones.from_config(camera))
+                        for camera in config['cameras']]
+
+    def start(self):
+        # Workers wait for the models on their first frame; loading them up front hides the load time
+        self.warmup.start()
+        if self.gallery_watcher:
+            self.gallery_watcher.start()
+        if self.metrics_exporter:
+            self.metrics_exporter.start()
+        for worker in self.workers:
+            worker.start()
+
+    def run(self, status_interval=STATUS_INTERVAL):
+        """Runs until stopped or until every camera has finished for good."""
+        self.start()
+        next_status = time.monotonic() + status_interval
+        while not self.stopping.wait(1.0):
+            if not any(worker.is_alive() for worker in self.workers):
+                break
+            if time.monotonic() >= next_status:
+                next_status += status_interval
+                for worker in self.workers:
+                    print(worker.status())
+        self.stop()
+
+    def stop(self):
+        print("Shutting down...")
+        self.stopping.set()
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            worker.join(timeout=35)  # Long enough for the recorder to write an open clip
+        self.batcher.stop()
+        self.unknown_faces.save()
+        if self.gallery_watcher:
+            self.gallery_watcher.stop()
+        if self.alerts:
+            self.alerts.stop()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-camera CCTV service.")
+    parser.add_argument('--config', default="cameras.json", help="JSON file listing the camera sources")
+    parser.add_argument('--status-interval', type=float, default=STATUS_INTERVAL,
+                        help="Seconds between status lines")
+    args = parser.parse_args()
+
+    service = CCTVService(load_config(args.config))
+
+    def request_stop(signum, frame):
+        print(f"Received signal {signum}.")
+        service.stopping.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    service.run(status_interval=args.status_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+
+class ClipRecorder:
+    """
+    Keeps the last `pre_seconds` of video in memory and writes event clips.
+
+    Frames are JPEG-compressed on a background thread before they go into the
+    ring buffer, so memory stays bounded and `add_frame` costs the caller
+    nothing but a queue put. `trigger` opens a clip from `pre_seconds` before
+    the event to `post_seconds` after it; events that arrive while a clip is
+    open, or whose pre-event window overlaps it, extend that clip instead of
+    starting a new one. Finished clips are written by a separate encoder
+    thread, so a slow VideoWriter never stalls detection.
+    """
+
+    def __init__(self, output_dir="clips", pre_seconds=5.0, post_seconds=5.0, max_clip_seconds=120.0,
+                 jpeg_quality=80, fourcc='mp4v'):
+        self.output_dir = output_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_clip_seconds = max_clip_seconds
+        self.jpeg_quality = jpeg_quality
+        self.fourcc = fourcc
+
+        self._buffer = deque()  # (timestamp, jpeg bytes) of the pre-event window
+        self._clip = None  # Clip being collected: {'start', 'end', 'events', 'frames'}
+        self._lock = threading.Lock()
+        self._frames = queue.Queue(maxsize=8)
+        self._clips = queue.Queue()
+        self.running = True
+        self.dropped_frames = 0
+        self.clips_written = []
+
+        self._compressor = threading.Thread(target=self._compress_loop, daemon=True)
+        self._encoder = threading.Thread(target=self._encode_loop, daemon=True)
+        self._compressor.start()
+        self._encoder.start()
+
+    def add_frame(self, frame, timestamp=None):
+        """Hands a frame to the recorder without blocking; it is dropped if the compressor is behind."""
+        timestamp = time.time() if timestamp is None else timestamp
+        try:
+            self._frames.put_nowait((timestamp, frame))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def trigger(self, event, timestamp=None):
+        """Records an event; the clip covers pre_seconds before to post_seconds after it."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if self._clip and timestamp - self.pre_seconds <= self._clip['end']:
+                # Overlapping event: merge into the open clip
+                self._clip['end'] = max(self._clip['end'], timestamp + self.post_seconds)
+                if event not in self._clip['events']:
+                    self._clip['events'].append(event)
+                return
+
+            if self._clip:
+                self._finish_clip()
+            start = timestamp - self.pre_seconds
+            self._clip = {
+                'start': start,
+                'end': timestamp + self.post_seconds,
+                'events': [event],
+                'frames': [item for item in self._buffer if item[0] >= start],
+            }
+            print(f"Recording clip for event '{event}'...")
+
+    def _finish_clip(self):
+        """Hands the open clip to the encoder; must be called with the lock held."""
+        clip, self._clip = self._clip, None
+        clip['frames'] = [item for item in clip['frames'] if item[0] <= clip['end']]
+        if clip['frames']:
+            self._clips.put(clip)
+
+    def _compress_loop(self):
+        while self.running or not self._frames.empty():
+            try:
+                timestamp, frame = self._frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                continue
+            item = (timestamp, jpeg.tobytes())
+
+            with self._lock:
+                self._buffer.append(item)
+                while self._buffer and self._buffer[0][0] < timestamp - self.pre_seconds:
+                    self._buffer.popleft()
+
+                if self._clip:
+                    self._clip['frames'].append(item)
+                    # Wait one pre-event window past the end, so a late overlapping event can still merge
+                    too_long = timestamp - self._clip['start'] >= self.max_clip_seconds
+                    if timestamp > self._clip['end'] + self.pre_seconds or too_long:
+                        self._finish_clip()
+
+    def _encode_loop(self):
+        while True:
+            clip = self._clips.get()
+            if clip is None:
+                break
+            try:
+                self._write_clip(clip)
+            except (cv2.error, OSError) as e:
+                print(f"Error writing clip: {e}")
+
+    def _write_clip(self, clip):
+        frames = clip['frames']
+        duration = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / duration if duration > 0 else 10.0
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = datetime.fromtimestamp(clip['start']).strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(self.output_dir, f"clip_{name}_{'_'.join(clip['events'])}.mp4")
+
+        writer = None
+        for _, jpeg in frames:
+            image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if writer is None:
+                height, width = image.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), fps, (width, height))
+            writer.write(image)
+        writer.release()
+
+        self.clips_written.append(path)
+        print(f"Clip saved at {path}")
+
+    def stop(self):
+        """Writes the open clip (if any) and waits for the background threads to finish."""
+        self.running = False
+        self._compressor.join(timeout=5)
+        with self._lock:
+            if self._clip:
+                self._finish_clip()
+        self._clips.put(None)
+        self._encoder.join(timeout=30)
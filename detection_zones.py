@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+
+
+def _polygons(polygons, kind):
+    """Validates a list of polygons from the config and returns them as int32 point arrays."""
+    result = []
+    for index, polygon in enumerate(polygons or []):
+        points = np.asarray(polygon, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError(f"{kind} polygon {index} needs at least 3 [x, y] points, got {polygon!r}")
+        result.append(np.round(points).astype(np.int32))
+    return result
+
+
+class DetectionZones:
+    """
+    Per-camera regions of interest and exclusion masks.
+
+    `zones` are polygons (lists of [x, y] points in frame pixels) where detections
+    count; without zones the whole frame counts. `exclusions` are polygons cut
+    out of them, e.g. a busy street or a TV screen. Detection only needs to run
+    on `crop(frame)`, the bounding rectangle of the active area, and `apply`
+    maps its results back to frame coordinates and drops every object whose
+    anchor point, the bottom center of its box (where a person stands), is
+    outside the active area. The mask is built once per frame size.
+    """
+
+    def __init__(self, zones=None, exclusions=None):
+        self.zones = _polygons(zones, 'Zone')
+        self.exclusions = _polygons(exclusions, 'Exclusion')
+        # (frame shape, mask, crop rectangle), replaced as a whole since two pipeline stages read it
+        self._prepared = (None, None, None)
+
+    @classmethod
+    def from_config(cls, camera):
+        """Returns the zones of a camera config entry ('zones' and 'exclude'), or None if it has neither."""
+        if not camera.get('zones') and not camera.get('exclude'):
+            return None
+        return cls(camera.get('zones'), camera.get('exclude'))
+
+    def _prepare(self, shape):
+        """Returns (mask, crop rectangle) for frames of this shape."""
+        shape = tuple(shape[:2])
+        prepared = self._prepared
+        if shape == prepared[0]:
+            return prepared[1], prepared[2]
+        height, width = shape
+        if self.zones:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, self.zones, 255)
+        else:
+            mask = np.full((height, width), 255, dtype=np.uint8)
+        if self.exclusions:
+            cv2.fillPoly(mask, self.exclusions, 0)
+
+        points = cv2.findNonZero(mask)
+        if points is None:
+            print(f"Warning: the detection zones leave nothing of a {width}x{height} frame to detect in")
+            rect = None
+        else:
+            x, y, w, h = cv2.boundingRect(points)
+            rect = (x, y, x + w, y + h)
+        self._prepared = (shape, mask, rect)
+        return mask, rect
+
+    def crop_rect(self, shape):
+        """Returns (x1, y1, x2, y2) of the active area for frames of this shape, or None if it is empty."""
+        return self._prepare(shape)[1]
+
+    def crop(self, frame):
+        """Returns (view of the active area, (x, y) offset), or (None, None) if nothing is active."""
+        rect = self.crop_rect(frame.shape)
+        if rect is None:
+            return None, None
+        x1, y1, x2, y2 = rect
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def contains(self, shape, x, y):
+        """Whether the frame pixel (x, y) is inside a zone and not excluded."""
+        mask = self._prepare(shape)[0]
+        height, width = mask.shape
+        x, y = min(max(int(x), 0), width - 1), min(max(int(y), 0), height - 1)
+        return bool(mask[y, x])
+
+    def apply(self, detections, offset, shape):
+        """Moves detections made on the crop back to frame coordinates and keeps those inside the zones."""
+        detections = detections.shifted(*offset)
+        if not len(detections):
+            return detections
+        mask = self._prepare(shape)[0]
+        height, width = mask.shape
+        boxes = detections.boxes
+        xs = np.clip((boxes[:, 0] + boxes[:, 2]) // 2, 0, width - 1)
+        ys = np.clip(boxes[:, 3] - 1, 0, height - 1)
+        return detections.select(mask[ys, xs] > 0)
+
+    def filter_faces(self, faces, shape):
+        """Keeps the faces whose center is inside the zones."""
+        return [face for face in faces
+                if self.contains(shape, (face['location'][1] + face['location'][3]) // 2,
+                                 (face['location'][0] + face['location'][2]) // 2)]
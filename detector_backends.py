@@ -0,0 +1,227 @@
+"""
+Inference backends for the YOLO detector.
+
+Every backend takes a list of BGR frames and returns, per frame, an (N, 6)
+float32 array of [x1, y1, x2, y2, score, class_id] rows in frame coordinates,
+the same layout as `results.boxes.data` of Ultralytics.
+
+- 'ultralytics': the PyTorch model through Ultralytics (any input size).
+- 'onnx': an exported ONNX model run with ONNX Runtime.
+- 'openvino': an exported OpenVINO IR model (.xml or export directory).
+
+The ONNX and OpenVINO models run at the fixed input size they were exported
+with; frames are letterboxed to it and the raw output is decoded and
+non-max-suppressed here with the Ultralytics defaults (conf 0.25, class-aware
+NMS at IoU 0.7, at most 300 boxes), so their detections match the PyTorch path.
+
+Export a model (INT8 is optional; OpenVINO calibrates with the Ultralytics
+default dataset, ONNX is quantized dynamically with ONNX Runtime):
+    python detector_backends.py --weights yolov8n.pt --format onnx --imgsz 640 --int8
+"""
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+BACKENDS = ('ultralytics', 'onnx', 'openvino')
+
+# Ultralytics prediction defaults, used for the exported models too
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+
+
+def letterbox(frame, size=640, color=(114, 114, 114)):
+    """
+    Resizes a frame to fit `size` x `size` keeping its aspect ratio and pads the rest.
+
+    Returns:
+        tuple: (padded image, scale, (pad_x, pad_y)) to map boxes back to the frame.
+    """
+    height, width = frame.shape[:2]
+    scale = min(size / float(height), size / float(width))
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    pad_x, pad_y = (size - new_width) / 2.0, (size - new_height) / 2.0
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return padded, scale, (left, top)
+
+
+def preprocess(frames, size):
+    """Letterboxes the frames into one (B, 3, size, size) float32 RGB blob scaled to [0, 1]."""
+    images, transforms = [], []
+    for frame in frames:
+        image, scale, pad = letterbox(frame, size)
+        images.append(image)
+        transforms.append((scale, pad))
+    blob = cv2.dnn.blobFromImages(images, scalefactor=1.0 / 255, swapRB=True)
+    return blob, transforms
+
+
+def postprocess(output, scale, pad, frame_shape, conf_threshold=CONF_THRESHOLD, iou_threshold=IOU_THRESHOLD,
+                max_detections=MAX_DETECTIONS):
+    """
+    Decodes one raw YOLOv8 output of shape (4 + classes, anchors) into detection rows.
+
+    Returns:
+        numpy.ndarray: (N, 6) float32 [x1, y1, x2, y2, score, class_id] in frame coordinates.
+    """
+    predictions = output.T  # (anchors, 4 + classes)
+    class_scores = predictions[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(class_scores)), class_ids]
+    keep = scores > conf_threshold
+    if not keep.any():
+        return np.zeros((0, 6), dtype=np.float32)
+    boxes, scores, class_ids = predictions[keep, :4], scores[keep], class_ids[keep]
+
+    # Center x/y, width, height in letterbox pixels -> x1, y1, x2, y2 in frame pixels
+    xy = (boxes[:, :2] - boxes[:, 2:] / 2 - pad) / scale
+    wh = boxes[:, 2:] / scale
+    height, width = frame_shape[:2]
+    x1y1 = np.clip(xy, 0, [width, height])
+    x2y2 = np.clip(xy + wh, 0, [width, height])
+
+    # Class-aware NMS, like Ultralytics
+    indices = cv2.dnn.NMSBoxesBatched(np.hstack([x1y1, x2y2 - x1y1]).tolist(), scores.tolist(),
+                                      class_ids.tolist(), conf_threshold, iou_threshold)
+    indices = np.asarray(indices, dtype=np.intp).reshape(-1)[:max_detections]
+    return np.hstack([x1y1[indices], x2y2[indices], scores[indices, None],
+                      class_ids[indices, None]]).astype(np.float32)
+
+
+class UltralyticsBackend:
+    """The Ultralytics PyTorch model; also handles exported models Ultralytics can load itself."""
+
+    name = 'ultralytics'
+
+    def __init__(self, weights='yolov8n.pt', imgsz=None):
+        from ultralytics import YOLO
+
+        self.model = YOLO(weights)
+        self.imgsz = imgsz
+
+    def predict(self, frames, imgsz=None):
+        imgsz = imgsz or self.imgsz
+        results = self.model(list(frames), imgsz=imgsz) if imgsz else self.model(list(frames))
+        return [result.boxes.data.cpu().numpy() for result in results]
+
+
+class _FixedSizeBackend:
+    """Shared letterbox / decode logic of the exported-model backends."""
+
+    def __init__(self, imgsz):
+        self.imgsz = imgsz
+
+    def _run(self, blob):
+        raise NotImplementedError
+
+    def predict(self, frames, imgsz=None):
+        """Runs the frames at the exported input size; `imgsz` is ignored."""
+        frames = list(frames)
+        if not frames:
+            return []
+        blob, transforms = preprocess(frames, self.imgsz)
+        if self.dynamic_batch:
+            outputs = self._run(blob)
+        else:
+            outputs = np.concatenate([self._run(blob[i:i + 1]) for i in range(len(frames))])
+        return [postprocess(output, scale, pad, frame.shape)
+                for output, (scale, pad), frame in zip(outputs, transforms, frames)]
+
+
+class OnnxBackend(_FixedSizeBackend):
+    """An exported ONNX model run with ONNX Runtime on the CPU."""
+
+    name = 'onnx'
+
+    def __init__(self, weights='yolov8n.onnx', imgsz=None, threads=None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(weights, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, _ = model_input.shape
+        # Dimensions exported as dynamic are reported as names or None
+        self.dynamic_batch = not isinstance(batch, int)
+        super().__init__(height if isinstance(height, int) else imgsz or 640)
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(_FixedSizeBackend):
+    """An exported OpenVINO IR model (FP32, FP16 or INT8) compiled for the CPU."""
+
+    name = 'openvino'
+
+    def __init__(self, weights='yolov8n_openvino_model', imgsz=None, device='CPU'):
+        import openvino as ov
+
+        if os.path.isdir(weights):
+            # Ultralytics exports into a directory holding the .xml / .bin pair
+            weights = next(os.path.join(weights, f) for f in sorted(os.listdir(weights)) if f.endswith('.xml'))
+        core = ov.Core()
+        model = core.read_model(weights)
+        self.compiled = core.compile_model(model, device, {'PERFORMANCE_HINT': 'LATENCY'})
+        model_input = model.input(0).get_partial_shape()
+        self.dynamic_batch = model_input[0].is_dynamic
+        super().__init__(model_input[2].get_length() if model_input[2].is_static else imgsz or 640)
+
+    def _run(self, blob):
+        return self.compiled([blob])[self.compiled.output(0)]
+
+
+def load_backend(name='ultralytics', weights=None, imgsz=None):
+    """Creates a detector backend by name; `weights` defaults to the usual export name."""
+    if name == 'ultralytics':
+        return UltralyticsBackend(weights or 'yolov8n.pt', imgsz)
+    if name == 'onnx':
+        return OnnxBackend(weights or 'yolov8n.onnx', imgsz)
+    if name == 'openvino':
+        return OpenVinoBackend(weights or 'yolov8n_openvino_model', imgsz)
+    raise ValueError(f"Unknown detector backend: {name} (expected one of {', '.join(BACKENDS)})")
+
+
+def export_model(weights='yolov8n.pt', format='onnx', imgsz=640, int8=False):
+    """Exports a YOLO model for a fixed-size backend and returns the path of the exported model."""
+    from ultralytics import YOLO
+
+    if format not in ('onnx', 'openvino'):
+        raise ValueError(f"Can only export to onnx or openvino, not {format}")
+
+    if format == 'openvino':
+        return YOLO(weights).export(format='openvino', imgsz=imgsz, int8=int8)
+
+    path = YOLO(weights).export(format='onnx', imgsz=imgsz, simplify=True)
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = os.path.splitext(path)[0] + "_int8.onnx"
+        quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+        path = quantized
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLO model for the ONNX Runtime or OpenVINO backend.")
+    parser.add_argument('--weights', default='yolov8n.pt', help="Ultralytics model to export")
+    parser.add_argument('--format', choices=('onnx', 'openvino'), default='onnx')
+    parser.add_argument('--imgsz', type=int, default=640, help="Fixed input size of the exported model")
+    parser.add_argument('--int8', action='store_true', help="Quantize the weights to INT8")
+    args = parser.parse_args()
+
+    print(f"Exported to {export_model(args.weights, args.format, args.imgsz, args.int8)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import cv2
+from PIL import Image, ImageTk
+
+from metrics import NULL_METRICS
+
+
+class FrameSlot:
+    """
+    Holds only the latest frame handed over by a worker thread.
+
+    It has the same `read_latest` interface as frame_pipeline.CameraCapture, so
+    the display can show either annotated frames or the raw camera feed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._timestamp = 0.0
+        self._frame = None
+
+    def put(self, frame):
+        with self._lock:
+            self._seq += 1
+            self._timestamp = time.monotonic()
+            self._frame = frame
+
+    def read_latest(self, last_seq=0, timeout=0):
+        """Returns (seq, timestamp, frame) if there is a frame newer than `last_seq`, else None."""
+        with self._lock:
+            if self._seq <= last_seq:
+                return None
+            return self._seq, self._timestamp, self._frame
+
+
+class DisplayCompositor:
+    """
+    Shows the latest frame of a source in a Tk label, on the Tk main loop.
+
+    Every refresh (at most `max_fps` per second, independent of the camera rate)
+    takes the newest frame, resizes it once to fit the widget (or `max_size`)
+    and only then converts it to RGB and a PhotoImage, so the display cost
+    depends on the window size rather than on the camera resolution. All Tk
+    calls happen on the main thread through `after`.
+    """
+
+    def __init__(self, root, label, source=None, max_fps=30, max_size=None, fit_widget=True, metrics=None):
+        self.root = root
+        self.label = label
+        self.source = source
+        self.max_fps = max_fps
+        self.max_size = max_size
+        self.fit_widget = fit_widget
+        self.metrics = metrics or NULL_METRICS
+        self.frames_shown = 0
+        self._last_seq = 0
+        self._after_id = None
+
+    def set_source(self, source):
+        self.source = source
+        self._last_seq = 0
+
+    def start(self):
+        if self._after_id is None:
+            self._refresh()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _target_size(self, frame):
+        """Returns the (width, height) the frame is shown at, keeping its aspect ratio."""
+        height, width = frame.shape[:2]
+        max_width, max_height = self.max_size or (width, height)
+        if self.fit_widget:
+            widget_width, widget_height = self.label.winfo_width(), self.label.winfo_height()
+            # Tk reports 1x1 until the widget is laid out
+            if widget_width > 1 and widget_height > 1:
+                max_width, max_height = min(max_width, widget_width), min(max_height, widget_height)
+
+        scale = min(max_width / float(width), max_height / float(height))
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def show(self, frame):
+        """Resizes, converts and displays one BGR frame; must be called on the Tk thread."""
+        with self.metrics.time('display'):
+            self._show(frame)
+        self.metrics.tick('display')
+
+    def _show(self, frame):
+        size = self._target_size(frame)
+        if size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+        # Convert frame to Image for Tkinter display
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        imgtk = ImageTk.PhotoImage(image=Image.fromarray(rgb_frame))
+        self.label.imgtk = imgtk
+        self.label.configure(image=imgtk)
+        self.frames_shown += 1
+
+    def _refresh(self):
+        if self.source is not None:
+            item = self.source.read_latest(self._last_seq, timeout=0)
+            if item is not None:
+                self._last_seq, _, frame = item
+                self.show(frame)
+        self._after_id = self.root.after(max(1, int(1000 / self.max_fps)), self._refresh)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from face_gallery import ENCODING_SIZE
+
+# Bump when the layout of the cache files changes so old caches get rebuilt
+CACHE_VERSION = 1
+
+INDEX_FILE = "index.json"
+MATRIX_FILE = "encodings.npy"
+
+
+def file_hash(path):
+    """Returns the SHA-1 of a file's content."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class EncodingCache:
+    """
+    On-disk cache of face encodings for the images of the known-face gallery.
+
+    The encodings live in a single .npy matrix, read into memory on load, next
+    to a JSON index mapping each image path to its size, mtime, content
+    hash, person name and row in the matrix. Images are only re-encoded when they
+    are new or their content actually changed, so an unchanged gallery loads
+    without decoding a single image. The matrix is never handed out memory-mapped:
+    a later save replaces the file, which Windows refuses while it is mapped.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.matrix_path = os.path.join(cache_dir, MATRIX_FILE)
+
+    def _load(self):
+        """Returns the cached index entries and the encoding matrix."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != CACHE_VERSION:
+                return {}, None
+            matrix = np.load(self.matrix_path)
+        except (OSError, ValueError):
+            return {}, None
+        return index['entries'], matrix
+
+    def _save(self, entries, matrix):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Write to temporary files first so a crash never leaves a half-written cache
+        matrix_tmp = self.matrix_path + ".tmp.npy"
+        index_tmp = self.index_path + ".tmp"
+        np.save(matrix_tmp, matrix)
+        with open(index_tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': entries}, f)
+        os.replace(matrix_tmp, self.matrix_path)
+        os.replace(index_tmp, self.index_path)
+
+    def load(self, image_files, encode_fn):
+        """
+        Returns encodings for the given images, encoding only new or changed files.
+
+        Args:
+            image_files (list): (path, name) tuples for every gallery image.
+            encode_fn (callable): Takes an image path and returns its face encoding,
+                or None if no face was found.
+
+        Returns:
+            tuple: (encodings, names), an (N, 128) float32 array and the matching names.
+            Images without a face are left out.
+        """
+        cached_entries, cached_matrix = self._load()
+
+        entries = {}
+        encodings = []
+        # Row in the cached matrix for every reused encoding, None for freshly encoded ones
+        source_rows = []
+        changed = len(cached_entries) != len(image_files)
+        for path, name in image_files:
+            stat = os.stat(path)
+            cached = cached_entries.get(path)
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'name': name}
+
+            if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+                entry['sha1'] = cached['sha1']
+            else:
+                # Touched files whose content did not change keep their encoding too
+                entry['sha1'] = file_hash(path)
+                if not cached or cached['sha1'] != entry['sha1']:
+                    cached = None
+                changed = True
+
+            if cached:
+                changed = changed or cached['name'] != name
+                if cached['row'] is not None:
+                    entry['row'] = len(encodings)
+                    encodings.append(None)
+                    source_rows.append(cached['row'])
+                else:
+                    entry['row'] = None
+            else:
+                encoding = encode_fn(path)
+                entry['row'] = None if encoding is None else len(encodings)
+                if encoding is not None:
+                    encodings.append(encoding)
+                    source_rows.append(None)
+            entries[path] = entry
+
+        if not changed and cached_matrix is not None and source_rows == list(range(len(cached_matrix))):
+            # Unchanged gallery: hand out the cached matrix as is
+            encodings = cached_matrix
+        else:
+            matrix = np.empty((len(encodings), ENCODING_SIZE), dtype=np.float32)
+            reused = [i for i, row in enumerate(source_rows) if row is not None]
+            if reused:
+                matrix[reused] = cached_matrix[[source_rows[i] for i in reused]]
+            for i, row in enumerate(source_rows):
+                if row is None:
+                    matrix[i] = encodings[i]
+            encodings = matrix
+            changed = True
+
+        names = [entry['name'] for entry in entries.values() if entry['row'] is not None]
+
+        if changed:
+            self._save(entries, encodings)
+        return encodings, names
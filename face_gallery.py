@@ -0,0 +1,143 @@
+import numpy as np
+
+# Length of a dlib face encoding as returned by face_recognition.face_encodings
+ENCODING_SIZE = 128
+
+
+class FaceGallery:
+    """
+    Known-face gallery stored as one contiguous float32 matrix.
+
+    All faces found in a frame are matched with a single matrix product against
+    the whole gallery (using |a - b|^2 = |a|^2 + |b|^2 - 2ab with precomputed
+    gallery norms), followed by a partial sort for the top-k candidates. This
+    replaces the per-face compare_faces + face_distance passes over Python lists.
+    """
+
+    def __init__(self, encodings=(), names=()):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(encodings) != len(names):
+            raise ValueError(f"Got {len(encodings)} encodings but {len(names)} names")
+
+        self.encodings = np.ascontiguousarray(encodings)
+        self.names = list(names)
+        self._squared_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+
+    @classmethod
+    def from_samples(cls, encodings, names):
+        """
+        Builds a gallery with one prototype per person from several samples each.
+
+        The prototype is the mean of a person's encodings, so matching cost grows
+        with the number of people rather than the number of photos. People keep
+        the order in which they first appear in `names`.
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        people = list(dict.fromkeys(names))
+        if len(people) == len(names):
+            return cls(encodings, names)
+
+        person_index = {name: i for i, name in enumerate(people)}
+        rows = np.array([person_index[name] for name in names], dtype=np.intp)
+        prototypes = np.zeros((len(people), ENCODING_SIZE), dtype=np.float32)
+        np.add.at(prototypes, rows, encodings)
+        prototypes /= np.bincount(rows, minlength=len(people))[:, None]
+        return cls(prototypes, people)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, encoding, name):
+        """Returns a new gallery with one extra entry (the gallery itself is never modified)."""
+        encodings = np.vstack([self.encodings, np.asarray(encoding, dtype=np.float32).reshape(1, -1)])
+        return FaceGallery(encodings, self.names + [name])
+
+    def update(self, index, encoding):
+        """Replaces one entry in place; only for galleries owned by a single writer (e.g. clustering)."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_SIZE)
+        self.encodings[index] = encoding
+        self._squared_norms[index] = encoding @ encoding
+
+    def remove(self, indices):
+        """Returns a new gallery without the given entries."""
+        keep = np.setdiff1d(np.arange(len(self)), np.asarray(list(indices), dtype=np.intp))
+        return FaceGallery(self.encodings[keep], [self.names[i] for i in keep])
+
+    def _scores(self, face_encodings):
+        """Returns the query norms and |b|^2 - 2ab, which ranks gallery entries like the distance."""
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        # Gallery-major product: one sequential pass over the (N, 128) matrix
+        scores = (self.encodings @ queries.T).T
+        scores *= -2.0
+        scores += self._squared_norms[None, :]
+        return query_norms, scores
+
+    @staticmethod
+    def _to_distances(query_norms, scores):
+        squared = scores + query_norms[:, None]
+        # Rounding can push the squared distance of near-identical vectors slightly below zero
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+    def distances(self, face_encodings):
+        """
+        Computes the euclidean distance of every face to every gallery entry.
+
+        Args:
+            face_encodings (list or numpy.ndarray): M face encodings.
+
+        Returns:
+            numpy.ndarray: (M, N) float32 distance matrix, N being the gallery size.
+        """
+        return self._to_distances(*self._scores(face_encodings))
+
+    def top_k(self, face_encodings, k=1):
+        """
+        Finds the k closest gallery entries for every face.
+
+        Only the k candidates per face are turned into actual distances.
+
+        Returns:
+            tuple: (indices, distances), both (M, k) arrays sorted by increasing distance.
+        """
+        query_norms, scores = self._scores(face_encodings)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(scores), 0), dtype=np.intp), np.empty((len(scores), 0), dtype=np.float32)
+
+        if k == 1:
+            candidates = scores.argmin(axis=1)[:, None]
+        elif k < len(self):
+            candidates = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(len(self)), scores.shape)
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(candidate_scores, axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+        distances = self._to_distances(query_norms, np.take_along_axis(candidate_scores, order, axis=1))
+        return indices, distances
+
+    def match(self, face_encodings, tolerance=0.6):
+        """
+        Matches every face against the gallery.
+
+        Args:
+            face_encodings (list or numpy.ndarray): M face encodings.
+            tolerance (float): Maximum distance for a face to count as a match.
+
+        Returns:
+            list: One (name, distance) tuple per face; name is "Unknown" when no
+            gallery entry is within the tolerance (distance is None for an empty gallery).
+        """
+        if len(face_encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [("Unknown", None)] * len(face_encodings)
+
+        indices, distances = self.top_k(face_encodings, k=1)
+        matches = []
+        for index, distance in zip(indices[:, 0], distances[:, 0]):
+            name = self.names[index] if distance <= tolerance else "Unknown"
+            matches.append((name, float(distance)))
+        return matches
@@ -1,86 +1,251 @@
-import face_recognition
 import cv2
 import os
+import threading
 import numpy as np
+from face_encoding_cache import EncodingCache
+from face_gallery import FaceGallery
 
-# Directory containing known faces
+# Directory containing known faces: either one image per person named after them
+# (known_faces/alice.jpg), or a folder per person with several images (known_faces/alice/*.jpg)
 KNOWN_FACES_DIR = "known_faces"
+IMAGE_EXTENSIONS = (".jpg", ".png")
 
 # Tolerance for face recognition (lower means more strict)
 TOLERANCE = 0.6
 
-# Initialize a list to store known face encodings and their names
-known_face_encodings = []
-known_face_names = []
+# When searching faces inside YOLO person boxes: the upper part of the box that is
+# searched, the padding added around it (both as fractions of the box size), and
+# the height small crops are upscaled to (at most MAX_CROP_UPSCALE times) so that
+# faces of distant people are still found
+PERSON_FACE_FRACTION = 0.5
+PERSON_BOX_PADDING = 0.1
+MIN_CROP_HEIGHT = 240
+MAX_CROP_UPSCALE = 3.0
+
+# Encodings of the known faces are cached here so unchanged images are never re-encoded
+ENCODING_CACHE_DIR = os.path.join(KNOWN_FACES_DIR, ".cache")
+
+
+# face_recognition loads the dlib models when it is imported, and the gallery may take a while to
+# encode, so both are only loaded on first use (see get_face_recognition and get_gallery)
+_face_recognition = None
+_gallery = None
+_face_recognition_lock = threading.Lock()
+# Also held around every use of the encoding cache, whose load and save go through the same files
+_gallery_lock = threading.Lock()
+# dlib's encoder networks keep per-call state, so encodings are computed one call at a time
+_encoder_lock = threading.Lock()
+
+
+def get_face_recognition():
+    """Returns the face_recognition module, importing it (and loading its models) on the first call."""
+    global _face_recognition
+    if _face_recognition is None:
+        with _face_recognition_lock:
+            if _face_recognition is None:
+                import face_recognition
+                _face_recognition = face_recognition
+    return _face_recognition
+
+
+def encode_face_image(image_path):
+    """Returns the encoding of the first face in an image file, or None if there is none."""
+    face_recognition = get_face_recognition()
+    image = face_recognition.load_image_file(image_path)
+
+    # Get the face encoding
+    with _encoder_lock:
+        encodings = face_recognition.face_encodings(image)
+    if not encodings:
+        print(f"Warning: No face found in {os.path.basename(image_path)}")
+        return None
+    return encodings[0]
+
+
+def list_known_face_images(directory=KNOWN_FACES_DIR):
+    """Returns (path, name) for every known-face image; hidden entries such as .cache are skipped."""
+    image_files = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if filename.startswith("."):
+            continue
+        if os.path.isdir(path):
+            # One folder per person, named after them
+            for image_name in sorted(os.listdir(path)):
+                if image_name.lower().endswith(IMAGE_EXTENSIONS) and not image_name.startswith("."):
+                    image_files.append((os.path.join(path, image_name), filename))
+        elif filename.lower().endswith(IMAGE_EXTENSIONS):
+            # Extract name from the filename
+            image_files.append((path, os.path.splitext(filename)[0]))
+    return image_files
 
 
 # Load known faces from the directory
 def load_known_faces():
-    for filename in os.listdir(KNOWN_FACES_DIR):
-        if filename.endswith(".jpg") or filename.endswith(".png"):
-            # Load image
-            image_path = os.path.join(KNOWN_FACES_DIR, filename)
-            image = face_recognition.load_image_file(image_path)
+    """
+    Returns the known face encodings and their names (one per image), re-encoding only new or changed images.
+
+    Uses the encoding cache, so callers hold `_gallery_lock`.
+    """
+    return EncodingCache(ENCODING_CACHE_DIR).load(list_known_face_images(), encode_face_image)
+
 
-            # Get the face encoding
-            encodings = face_recognition.face_encodings(image)
-            if encodings:
-                known_face_encodings.append(encodings[0])
-                # Extract name from the filename
-                name = os.path.splitext(filename)[0]
-                known_face_names.append(name)
-            else:
-                print(f"Warning: No face found in {filename}")
+def get_gallery():
+    """Returns the known faces as a contiguous matrix used for matching, loading them on the first call."""
+    global _gallery
+    if _gallery is None:
+        with _gallery_lock:
+            if _gallery is None:
+                _gallery = FaceGallery.from_samples(*load_known_faces())
+    return _gallery
 
 
-# Load the known faces at the start
-load_known_faces()
+def set_gallery(gallery):
+    """Swaps in a new gallery; recognitions already running finish with the old one."""
+    global _gallery
+    with _gallery_lock:
+        _gallery = gallery
 
 
-def recognize_faces(frame):
+def reload_gallery():
+    """Re-reads the known faces (only new or changed images are encoded) and swaps in the new gallery."""
+    global _gallery
+    # Recognition keeps using the current gallery meanwhile; only loaders wait for the lock
+    with _gallery_lock:
+        gallery = FaceGallery.from_samples(*load_known_faces())
+        _gallery = gallery
+    return gallery
+
+
+def __getattr__(name):
+    # `gallery`, `known_face_encodings` (one prototype row per person, the mean of their photos) and
+    # `known_face_names` (one name per row) are still available as module attributes; they trigger
+    # the lazy load like get_gallery()
+    if name == 'gallery':
+        return get_gallery()
+    if name == 'known_face_encodings':
+        return get_gallery().encodings
+    if name == 'known_face_names':
+        return get_gallery().names
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def locate_faces(rgb_frame):
+    """Returns the (top, right, bottom, left) locations of all faces in the frame."""
+    return get_face_recognition().face_locations(rgb_frame)
+
+
+def warm_up(size=160):
+    """Loads the models and the gallery and runs the face detector and encoder once on a dummy image."""
+    get_gallery()
+    image = np.zeros((size, size, 3), dtype=np.uint8)
+    locate_faces(image)
+    with _encoder_lock:
+        get_face_recognition().face_encodings(image, [(0, size, size, 0)])
+
+
+def identify_faces(rgb_frame, face_locations):
     """
-    Recognizes faces in the given frame.
+    Encodes the faces at the given locations and matches them against the gallery.
 
     Args:
-        frame (numpy.ndarray): The input image/frame from the camera.
+        rgb_frame (numpy.ndarray): The frame in RGB order.
+        face_locations (list): (top, right, bottom, left) tuples of the faces to identify.
 
     Returns:
-        list: A list of recognized faces with their names and bounding boxes.
+        list: A list of faces with their names, bounding boxes, match distances and encodings.
     """
-    recognized_faces = []
+    if not face_locations:
+        return []
 
-    # Convert the frame to RGB (as face_recognition uses RGB)
-    rgb_frame = frame[:, :, ::-1]
+    with _encoder_lock:
+        face_encodings = get_face_recognition().face_encodings(rgb_frame, face_locations)
 
-    # Detect all face locations and encodings in the frame
-    face_locations = face_recognition.face_locations(rgb_frame)
-    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+    # Match all faces in the frame against the whole gallery at once (one prototype per person)
+    matches = get_gallery().match(face_encodings, TOLERANCE)
 
-    for face_encoding, face_location in zip(face_encodings, face_locations):
-        # Compare face encodings with known faces
-        matches = face_recognition.compare_faces(known_face_encodings, face_encoding, TOLERANCE)
-        name = "Unknown"
+    return [{'name': name, 'location': face_location, 'distance': distance, 'encoding': face_encoding}
+            for (name, distance), face_location, face_encoding in zip(matches, face_locations, face_encodings)]
 
-        # Find the best match if any
-        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-        if matches:
-            best_match_index = np.argmin(face_distances)
-            if matches[best_match_index]:
-                name = known_face_names[best_match_index]
-
-        # Store the recognized face details
-        recognized_faces.append({
-            'name': name,
-            'location': face_location
-        })
 
+def draw_faces(frame, faces):
+    """Draws a labelled rectangle around every face on the frame in place."""
+    for face in faces:
         # Draw a rectangle around the face and label it
-        top, right, bottom, left = face_location
+        top, right, bottom, left = face['location']
+        name = face['name']
         color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)  # Green for known, Red for unknown
         cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
         cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
+
+
+def locate_faces_in_people(rgb_frame, person_boxes):
+    """
+    Finds faces only inside the upper part of each person bounding box.
+
+    Args:
+        rgb_frame (numpy.ndarray): The frame in RGB order.
+        person_boxes (list): (x1, y1, x2, y2) person boxes from `detect_objects`.
+
+    Returns:
+        list: (top, right, bottom, left) face locations in frame coordinates.
+    """
+    frame_height, frame_width = rgb_frame.shape[:2]
+    face_locations = []
+    for x1, y1, x2, y2 in person_boxes:
+        width, height = x2 - x1, y2 - y1
+        pad_x, pad_y = int(width * PERSON_BOX_PADDING), int(height * PERSON_BOX_PADDING)
+        crop_left, crop_right = max(0, x1 - pad_x), min(frame_width, x2 + pad_x)
+        crop_top = max(0, y1 - pad_y)
+        crop_bottom = min(frame_height, y1 + int(height * PERSON_FACE_FRACTION) + pad_y)
+        if crop_right <= crop_left or crop_bottom <= crop_top:
+            continue
+
+        crop = rgb_frame[crop_top:crop_bottom, crop_left:crop_right]
+        # Upscale crops of distant people so the HOG detector can still find their faces
+        scale = min(MAX_CROP_UPSCALE, MIN_CROP_HEIGHT / float(crop.shape[0]))
+        if scale > 1.0:
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        else:
+            scale = 1.0
+
+        for top, right, bottom, left in locate_faces(crop):
+            # Map the face back to frame coordinates
+            location = (crop_top + int(top / scale), crop_left + int(right / scale),
+                        crop_top + int(bottom / scale), crop_left + int(left / scale))
+
+            # Overlapping person boxes can find the same face twice
+            center_y, center_x = (location[0] + location[2]) // 2, (location[1] + location[3]) // 2
+            if not any(t <= center_y <= b and l <= center_x <= r for t, r, b, l in face_locations):
+                face_locations.append(location)
+    return face_locations
+
+
+def recognize_faces(frame, person_boxes=None, draw=False):
+    """
+    Recognizes faces in the given frame.
+
+    Args:
+        frame (numpy.ndarray): The input image/frame from the camera.
+        person_boxes (list): Optional person boxes from `detect_objects`; when given,
+            faces are only searched inside them instead of the whole frame.
+        draw (bool): Also draw the faces on the frame (in place); off by default, like `detect_objects`.
+
+    Returns:
+        list: A list of recognized faces with their names and bounding boxes.
+    """
+    # Convert the frame to RGB (as face_recognition uses RGB)
+    rgb_frame = frame[:, :, ::-1]
+
+    # Detect all face locations, then encode and identify them
+    if person_boxes is None:
+        face_locations = locate_faces(rgb_frame)
+    else:
+        face_locations = locate_faces_in_people(rgb_frame, person_boxes)
+    recognized_faces = identify_faces(rgb_frame, face_locations)
 
-    return recognized_faces, frame
+    return recognized_faces, draw_faces(frame, recognized_faces) if draw else frame
 
 
 if __name__ == "__main__":
@@ -93,7 +258,7 @@ if __name__ == "__main__":
             break
 
         # Recognize faces in the frame
-        recognized_faces, annotated_frame = recognize_faces(frame)
+        recognized_faces, annotated_frame = recognize_faces(frame, draw=True)
 
         # Display the annotated frame
         cv2.imshow('Face Recognition', annotated_frame)
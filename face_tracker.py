@@ -0,0 +1,155 @@
+import itertools
+
+from face_recognition_module import TOLERANCE, draw_faces, identify_faces, locate_faces, locate_faces_in_people
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) face locations."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+class FaceTrack:
+    """A face followed across frames together with the identity it was last given."""
+
+    def __init__(self, track_id, location):
+        self.track_id = track_id
+        self.location = location
+        self.name = "Unknown"
+        self.distance = None
+        self.encoding = None  # Set only on frames where the face was actually encoded
+        self.last_encoded = None  # Frame count of the last encoding, None until identified
+        self.misses = 0
+
+
+class FaceTracker:
+    """
+    IoU tracker that sits around face recognition.
+
+    Faces are still located on every frame, but the expensive dlib encoding only
+    runs for faces that:
+      - start a new track,
+      - have not been encoded for `reverify_every` frames,
+      - moved so much that the match with their track is weak (IoU below `min_match_iou`),
+      - or were identified with a distance within `uncertain_margin` of the tolerance.
+
+    All other faces keep the identity of their track. `recognize` has the same
+    contract as `recognize_faces`, so it can be used as a drop-in replacement.
+    """
+
+    def __init__(self, iou_threshold=0.3, min_match_iou=0.5, reverify_every=30, max_misses=5,
+                 uncertain_margin=0.05, locate_fn=None):
+        self.iou_threshold = iou_threshold
+        self.min_match_iou = min_match_iou
+        self.reverify_every = reverify_every
+        self.max_misses = max_misses
+        self.uncertain_margin = uncertain_margin
+        self.locate_fn = locate_fn or locate_faces
+
+        self.tracks = []
+        self.frame_count = 0
+        self._ids = itertools.count(1)
+
+        # How many faces were encoded vs carried over from their track
+        self.encoded_faces = 0
+        self.reused_faces = 0
+
+    def _match(self, locations):
+        """Greedily pairs tracks and locations by decreasing IoU; returns {location index: (track, iou)}."""
+        pairs = []
+        for track in self.tracks:
+            for index, location in enumerate(locations):
+                overlap = iou(track.location, location)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, index, track))
+        pairs.sort(key=lambda pair: pair[0], reverse=True)
+
+        matched = {}
+        used_tracks = set()
+        for overlap, index, track in pairs:
+            if index in matched or track.track_id in used_tracks:
+                continue
+            matched[index] = (track, overlap)
+            used_tracks.add(track.track_id)
+        return matched
+
+    def _needs_encoding(self, track, overlap):
+        if track.last_encoded is None:
+            return True
+        if self.frame_count - track.last_encoded >= self.reverify_every:
+            return True
+        if overlap < self.min_match_iou:
+            return True
+        return track.distance is not None and abs(track.distance - TOLERANCE) < self.uncertain_margin
+
+    def recognize(self, frame, person_boxes=None, draw=False):
+        """
+        Recognizes faces in the given frame, reusing identities of tracked faces.
+
+        Args:
+            frame (numpy.ndarray): The input image/frame from the camera.
+            person_boxes (list): Optional person boxes; when given, faces are only
+                searched inside them (see `locate_faces_in_people`).
+            draw (bool): Also draw the faces on the frame (in place); off by default, like `detect_objects`.
+
+        Returns:
+            tuple: (faces, annotated_frame); each face also carries its 'track_id', and its
+            'encoding' is None unless the face was encoded on this frame.
+        """
+        self.frame_count += 1
+
+        # Convert the frame to RGB (as face_recognition uses RGB)
+        rgb_frame = frame[:, :, ::-1]
+        if person_boxes is None:
+            locations = self.locate_fn(rgb_frame)
+        else:
+            locations = locate_faces_in_people(rgb_frame, person_boxes)
+        matched = self._match(locations)
+
+        current_tracks = []
+        to_encode = []
+        for index, location in enumerate(locations):
+            if index in matched:
+                track, overlap = matched[index]
+            else:
+                track, overlap = FaceTrack(next(self._ids), location), 0.0
+
+            track.location = location
+            track.misses = 0
+            current_tracks.append(track)
+            if self._needs_encoding(track, overlap):
+                to_encode.append(track)
+
+        # Only the faces that need it go through the encoder, in one call
+        for track, face in zip(to_encode, identify_faces(rgb_frame, [track.location for track in to_encode])):
+            track.name = face['name']
+            track.distance = face['distance']
+            track.encoding = face['encoding']
+            track.last_encoded = self.frame_count
+        self.encoded_faces += len(to_encode)
+        self.reused_faces += len(current_tracks) - len(to_encode)
+
+        # Keep unmatched tracks around for a few frames in case the face detector missed them
+        for track in current_tracks:
+            if track not in to_encode:
+                track.encoding = None
+        for track in self.tracks:
+            if track not in current_tracks:
+                track.misses += 1
+                if track.misses <= self.max_misses:
+                    current_tracks.append(track)
+        self.tracks = current_tracks
+
+        faces = [{'name': track.name, 'location': track.location, 'distance': track.distance,
+                  'encoding': track.encoding, 'track_id': track.track_id}
+                 for track in self.tracks if track.misses == 0]
+        return faces, draw_faces(frame, faces) if draw else frame
+
+    def reset(self):
+        self.tracks = []
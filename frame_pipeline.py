@@ -0,0 +1,323 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from face_recognition_module import draw_faces
+from gun_and_human_detection import Detections, draw_detections
+from metrics import NULL_METRICS
+
+
+class CameraCapture(threading.Thread):
+    """
+    Reads frames from a cv2.VideoCapture on a dedicated thread.
+
+    Only the newest frame is kept, so slow consumers never fall behind the
+    camera: they always get the most recent frame and skip whatever they missed.
+    Every frame gets an increasing sequence number so that results computed by
+    the inference stages can be matched to the frame they came from.
+    """
+
+    def __init__(self, cap, metrics=None):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.metrics = metrics or NULL_METRICS
+        self.finished = False
+        self._stop_event = threading.Event()
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._timestamp = 0.0
+        self._frame = None
+
+        # Ask the driver not to queue up old frames (ignored by some backends)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def run(self):
+        while not self._stop_event.is_set() and self.cap.isOpened():
+            with self.metrics.time('capture'):
+                ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.metrics.tick('capture')
+            with self._condition:
+                self._seq += 1
+                self._timestamp = time.monotonic()
+                self._frame = frame
+                self._condition.notify_all()
+
+        with self._condition:
+            self.finished = True
+            self._condition.notify_all()
+
+    def read_latest(self, last_seq=0, timeout=0.5):
+        """
+        Waits for a frame newer than `last_seq`.
+
+        Args:
+            last_seq (int): Sequence number of the last frame the caller has seen.
+            timeout (float): Maximum time to wait in seconds.
+
+        Returns:
+            tuple: (seq, timestamp, frame), or None if no newer frame arrived in time.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > last_seq or self.finished, timeout)
+            if self._seq <= last_seq:
+                return None
+            return self._seq, self._timestamp, self._frame
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def put_latest(bounded_queue, item):
+    """Puts an item on a bounded queue, dropping the oldest entry if it is full."""
+    while True:
+        try:
+            bounded_queue.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                bounded_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def annotate_frame(frame, detections, faces):
+    """Draws detection and face results onto the frame in place."""
+    draw_detections(frame, detections)
+    return draw_faces(frame, faces)
+
+
+class FramePipeline:
+    """
+    Staged capture / detect / recognize / render pipeline.
+
+    - Capture: a CameraCapture thread that always holds the newest frame.
+    - Detect: a worker that runs `detect_fn` on the newest frame it has not seen yet,
+      optionally only when a MotionGate sees enough motion.
+    - Recognize: a worker fed by a bounded queue with frames that contain a person.
+      With `faces_in_people` the person boxes are passed on to `recognize_fn` so
+      faces are only searched inside them. Both inference stages read the captured
+      frame in place, so `recognize_fn` is called with draw=False. `on_faces(seq, faces, frame)` gets the
+      unannotated frame, e.g. for cropping unknown faces.
+    - Render: `frames()` yields every captured frame at camera rate, overlaid with
+      the most recent results that are not older than `max_result_age` seconds.
+
+    Inference stages never see stale frames, so end-to-end latency stays bounded
+    even when detection runs far slower than the camera. An optional
+    AdaptiveScheduler additionally trades detection stride, YOLO input size and
+    face recognition frequency for latency when the machine is overloaded.
+
+    With `zones` (DetectionZones) the motion gate and the detector only see the
+    bounding crop of the active area, and detections outside it are dropped
+    before they reach `on_detections` or face recognition.
+
+    A frame that fails in detection or recognition is logged and skipped; after
+    `max_errors` failures in a row the pipeline stops (`frames()` ends) and
+    `error` says why, so its owner can report it or restart the camera.
+
+    With `metrics` (a CameraMetrics) every stage is timed, and the recognition
+    queue depth and dropped frames are exported as gauges; the capture thread
+    should get the same metrics object.
+    """
+
+    def __init__(self, capture, detect_fn, recognize_fn, on_detections=None, on_faces=None,
+                 queue_size=1, max_result_age=1.0, motion_gate=None, faces_in_people=False, scheduler=None,
+                 metrics=None, zones=None, max_errors=5):
+        self.capture = capture
+        self.detect_fn = detect_fn
+        self.recognize_fn = recognize_fn
+        self.on_detections = on_detections
+        self.on_faces = on_faces
+        self.max_result_age = max_result_age
+        self.motion_gate = motion_gate
+        self.faces_in_people = faces_in_people
+        self.scheduler = scheduler
+        self.metrics = metrics or NULL_METRICS
+        self.zones = zones
+        self.max_errors = max_errors
+
+        self.recognition_queue = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self.error = None  # Why the pipeline stopped itself, if it did
+        self._workers = []
+        self._lock = threading.Lock()
+        self._failures = {'detect': 0, 'recognize': 0}
+
+        # Latest results, each tagged with the sequence number and capture time of its frame
+        self.detection_result = (0, 0.0, Detections())
+        self.face_result = (0, 0.0, [])
+        self.dropped_frames = 0
+        self.metrics.gauge('recognition_queue_depth', self.recognition_queue.qsize)
+        self.metrics.gauge('dropped_frames', lambda: self.dropped_frames)
+
+    def start(self):
+        self.running = True
+        self.error = None
+        if not self.capture.is_alive():
+            self.capture.start()
+        self._workers = [
+            threading.Thread(target=self._detection_loop, daemon=True),
+            threading.Thread(target=self._recognition_loop, daemon=True),
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self):
+        self.running = False
+        self.capture.stop()
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join(timeout=2)
+
+    def _stage_failed(self, stage, seq, error):
+        """Logs a failed frame and stops the pipeline once a stage failed `max_errors` times in a row."""
+        with self._lock:
+            self._failures[stage] += 1
+            failures = self._failures[stage]
+        print(f"Error: {stage} failed on frame {seq}: {error}")
+        if failures >= self.max_errors and self.running:
+            self.error = f"{stage} failed {failures} times in a row ({error})"
+            print(f"Error: stopping the pipeline, {self.error}")
+            self.running = False
+
+    def _stage_succeeded(self, stage):
+        with self._lock:
+            self._failures[stage] = 0
+
+    def _detection_loop(self):
+        last_seq = 0
+        while self.running:
+            item = self.capture.read_latest(last_seq)
+            if item is None:
+                if self.capture.finished:
+                    break
+                continue
+
+            seq, timestamp, frame = item
+            if last_seq:
+                self.dropped_frames += seq - last_seq - 1
+            last_seq = seq
+
+            if self.scheduler and not self.scheduler.should_detect(seq):
+                continue
+
+            # Only the part of the frame covered by the detection zones is looked at
+            region, offset = self.zones.crop(frame) if self.zones else (frame, None)
+            if region is None:
+                continue
+
+            # Skip detection entirely while the scene is static
+            if self.motion_gate:
+                with self.metrics.time('motion_gate'):
+                    process = self.motion_gate.should_process(region)
+                if not process:
+                    continue
+            if self.scheduler:
+                self.scheduler.record_detected(seq)
+
+            try:
+                self._detect_frame(seq, timestamp, frame, region, offset)
+            except Exception as e:  # Any model or callback error: skip the frame instead of ending the stage
+                self._stage_failed('detect', seq, e)
+            else:
+                self._stage_succeeded('detect')
+
+    def _detect_frame(self, seq, timestamp, frame, region, offset):
+        # No copy: detection only reads the frame, which is shared with the render stage
+        started = time.monotonic()
+        if self.scheduler:
+            detections, _ = self.detect_fn(region, imgsz=self.scheduler.imgsz)
+        else:
+            detections, _ = self.detect_fn(region)
+        if self.zones:
+            detections = self.zones.apply(detections, offset, frame.shape)
+        finished = time.monotonic()
+        if self.scheduler:
+            self.scheduler.record_stage('detect', finished - started)
+            self.scheduler.record_latency(finished - timestamp)
+        self.metrics.record('detect', finished - started)
+        self.metrics.record('detect_latency', finished - timestamp)
+        self.metrics.tick('detect')
+        with self._lock:
+            self.detection_result = (seq, timestamp, detections)
+
+        if self.on_detections:
+            self.on_detections(seq, detections)
+
+        person_boxes = detections.boxes_of('person')
+        if person_boxes and (not self.scheduler or self.scheduler.should_recognize()):
+            put_latest(self.recognition_queue, (seq, timestamp, frame, person_boxes))
+
+    def _recognition_loop(self):
+        while self.running:
+            try:
+                seq, timestamp, frame, person_boxes = self.recognition_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                self._recognize_frame(seq, timestamp, frame, person_boxes)
+            except Exception as e:  # Any model or callback error: skip the frame instead of ending the stage
+                self._stage_failed('recognize', seq, e)
+            else:
+                self._stage_succeeded('recognize')
+
+    def _recognize_frame(self, seq, timestamp, frame, person_boxes):
+        started = time.monotonic()
+        if self.faces_in_people:
+            faces, _ = self.recognize_fn(frame, person_boxes, draw=False)
+        else:
+            faces, _ = self.recognize_fn(frame, draw=False)
+            if self.zones:
+                # Faces found inside person boxes already belong to someone in a zone
+                faces = self.zones.filter_faces(faces, frame.shape)
+        finished = time.monotonic()
+        if self.scheduler:
+            self.scheduler.record_stage('recognize', finished - started)
+            self.scheduler.record_latency(finished - timestamp)
+        self.metrics.record('recognize', finished - started)
+        self.metrics.record('recognize_latency', finished - timestamp)
+        self.metrics.tick('recognize')
+        with self._lock:
+            self.face_result = (seq, timestamp, faces)
+
+        if self.on_faces:
+            self.on_faces(seq, faces, frame)
+
+    def latest_results(self, now=None):
+        """Returns the detections and faces that are still fresh enough to display."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            _, detection_time, detections = self.detection_result
+            _, face_time, faces = self.face_result
+
+        if now - detection_time > self.max_result_age:
+            detections = Detections()
+        if now - face_time > self.max_result_age:
+            faces = []
+        return detections, faces
+
+    def frames(self):
+        """
+        Render stage: yields (seq, annotated_frame) for every captured frame.
+
+        Stops when the pipeline is stopped or the camera stops delivering frames.
+        """
+        last_seq = 0
+        while self.running:
+            item = self.capture.read_latest(last_seq)
+            if item is None:
+                if self.capture.finished:
+                    break
+                continue
+
+            seq, timestamp, frame = item
+            last_seq = seq
+            detections, faces = self.latest_results(timestamp)
+            with self.metrics.time('render'):
+                annotated_frame = annotate_frame(frame.copy(), detections, faces)
+            self.metrics.tick('render')
+            yield seq, annotated_frame
@@ -0,0 +1,75 @@
+import os
+import threading
+
+import face_recognition_module
+
+
+def known_faces_snapshot():
+    """Returns {path: (size, mtime)} of every known-face image; cheap enough to poll every few seconds."""
+    snapshot = {}
+    for path, _ in face_recognition_module.list_known_face_images():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Removed between listing and stat; the next poll sees it gone
+            continue
+        snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class GalleryWatcher(threading.Thread):
+    """
+    Polls the known faces directory and reloads the gallery when images change.
+
+    Only a listing and a stat per image happen on each poll. When something was
+    added, replaced or removed, the gallery is rebuilt through the encoding
+    cache (so only the changed images are encoded) and swapped into
+    face_recognition_module in one assignment; recognitions in progress finish
+    with the previous gallery. Polling avoids a file watching dependency and
+    also works on network shares.
+    """
+
+    def __init__(self, interval=5.0):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.reloads = 0
+        self._stop_event = threading.Event()
+        self._snapshot = None
+
+    def run(self):
+        try:
+            self._snapshot = known_faces_snapshot()
+        except OSError as e:
+            print(f"Warning: cannot watch the known faces: {e}")
+            self._snapshot = {}
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Reloads the gallery if the directory changed since the last check; returns whether it did."""
+        try:
+            snapshot = known_faces_snapshot()
+        except OSError as e:
+            print(f"Warning: cannot read the known faces: {e}")
+            return False
+        if snapshot == self._snapshot:
+            return False
+
+        previous = self._snapshot or {}
+        added = len(snapshot.keys() - previous.keys())
+        removed = len(previous.keys() - snapshot.keys())
+        changed = sum(1 for path in snapshot.keys() & previous.keys() if snapshot[path] != previous[path])
+        try:
+            gallery = face_recognition_module.reload_gallery()
+        except Exception as e:  # A broken image must not stop recognition with the current gallery
+            print(f"Error: could not reload the known faces: {e}")
+            return False
+        # Only remember the new state once it is live, so a failed reload is retried
+        self._snapshot = snapshot
+        self.reloads += 1
+        print(f"Known faces reloaded: {len(gallery)} people from {len(snapshot)} images "
+              f"({added} added, {changed} changed, {removed} removed)")
+        return True
+
+    def stop(self):
+        self._stop_event.set()
@@ -1,48 +1,244 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
 import cv2
-from ultralytics import YOLO
+import numpy as np
+from detector_backends import load_backend
+
+# Detector backend ('ultralytics', 'onnx' or 'openvino', see detector_backends.py) and the model it loads
+# (use 'yolov8n.pt' for a lightweight model or your custom model). Exported ONNX/OpenVINO models run at
+# their fixed input size, so DETECTOR_IMGSZ and the imgsz argument of detect_objects only affect Ultralytics.
+DETECTOR_BACKEND = os.environ.get('CCTV_DETECTOR_BACKEND', 'ultralytics')
+DETECTOR_WEIGHTS = os.environ.get('CCTV_DETECTOR_WEIGHTS') or None
+DETECTOR_IMGSZ = None
 
-# Load YOLOv8 model (use 'yolov8n.pt' for a lightweight model or your custom model)
-model = YOLO('yolov8n.pt')  # Replace with 'your_custom_model.pt' if you have one
+# The YOLOv8 model is loaded through the configured backend on first use (see get_backend)
+_backend = None
+_backend_lock = threading.Lock()
 
 # Define the classes we're interested in (for the pre-trained COCO model)
 # COCO class IDs: '0' is for 'person', and a custom ID should be used for 'gun' if trained
 TARGET_CLASSES = {'person': 0, 'gun': 1}  # You may need to adjust the IDs if using a custom model
+CLASS_LABELS = {class_id: label for label, class_id in TARGET_CLASSES.items()}
+# Detections below this score are dropped (the backends already apply the same Ultralytics default)
+CONFIDENCE_THRESHOLD = 0.25
 
+# Box colors when drawing: green for person, red for gun
+LABEL_COLORS = {'person': (0, 255, 0), 'gun': (0, 0, 255)}
 
-def detect_objects(frame):
+
+class Detections:
+    """
+    The detections of one frame as parallel NumPy arrays.
+
+    `boxes` is an (N, 4) int32 array of [x1, y1, x2, y2] frame pixels, `scores`
+    an (N,) float32 array and `class_ids` an (N,) int32 array. Queries such as
+    `has_label('gun')` (or `'gun' in detections`) and `boxes_of('person')` are
+    single array operations. Iterating yields the {'label', 'confidence', 'bbox'}
+    dicts of earlier versions for code that only looks at a few detections.
+    """
+
+    def __init__(self, boxes=None, scores=None, class_ids=None):
+        self.boxes = np.zeros((0, 4), np.int32) if boxes is None else np.asarray(boxes, np.int32).reshape(-1, 4)
+        self.scores = np.zeros(0, np.float32) if scores is None else np.asarray(scores, np.float32).reshape(-1)
+        self.class_ids = np.zeros(0, np.int32) if class_ids is None else np.asarray(class_ids, np.int32).reshape(-1)
+
+    @classmethod
+    def from_rows(cls, rows, conf_threshold=CONFIDENCE_THRESHOLD):
+        """Keeps the target classes above the threshold of (N, 6) [x1, y1, x2, y2, score, class_id] rows."""
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, 6)
+        class_ids = rows[:, 5].astype(np.int32)
+        keep = np.isin(class_ids, list(CLASS_LABELS)) & (rows[:, 4] >= conf_threshold)
+        return cls(rows[keep, :4], rows[keep, 4], class_ids[keep])
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __iter__(self):
+        for box, score, class_id in zip(self.boxes.tolist(), self.scores.tolist(), self.class_ids.tolist()):
+            yield {'label': CLASS_LABELS.get(class_id, str(class_id)), 'confidence': score, 'bbox': tuple(box)}
+
+    def __contains__(self, label):
+        return self.has_label(label)
+
+    def __repr__(self):
+        return f"Detections({list(self)!r})"
+
+    @property
+    def labels(self):
+        return [CLASS_LABELS.get(class_id, str(class_id)) for class_id in self.class_ids.tolist()]
+
+    def has_label(self, label):
+        """Whether any detection has this label, e.g. `detections.has_label('gun')`."""
+        class_id = TARGET_CLASSES.get(label)
+        return class_id is not None and bool((self.class_ids == class_id).any())
+
+    def select(self, keep):
+        """Returns the detections selected by a boolean mask or index array."""
+        return Detections(self.boxes[keep], self.scores[keep], self.class_ids[keep])
+
+    def with_label(self, label):
+        return self.select(self.class_ids == TARGET_CLASSES.get(label, -1))
+
+    def boxes_of(self, label):
+        """Returns the (x1, y1, x2, y2) boxes of one label as a list of tuples."""
+        return [tuple(box) for box in self.with_label(label).boxes.tolist()]
+
+    def shifted(self, dx, dy):
+        """Returns the detections moved by (dx, dy), e.g. from a crop back to the full frame."""
+        return Detections(self.boxes + np.array([dx, dy, dx, dy], np.int32), self.scores, self.class_ids)
+
+
+def draw_detections(frame, detections):
+    """Draws the detection boxes and labels onto the frame in place and returns it."""
+    for (x1, y1, x2, y2), score, label in zip(detections.boxes.tolist(), detections.scores.tolist(),
+                                               detections.labels):
+        color = LABEL_COLORS.get(label, (255, 255, 0))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{label} {score:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
+
+
+def get_backend():
+    """Returns the detector backend, loading the model on the first call (other callers wait for it)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = load_backend(DETECTOR_BACKEND, DETECTOR_WEIGHTS, DETECTOR_IMGSZ)
+    return _backend
+
+
+def set_backend(name, weights=None, imgsz=None):
+    """Switches every later detection (including running DetectionBatchers) to another backend."""
+    global _backend
+    backend = load_backend(name, weights, imgsz)
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def warm_up(width=640, height=480):
+    """Loads the model and runs one dummy inference, so the first real frame is not slowed down."""
+    get_backend().predict([np.zeros((height, width, 3), dtype=np.uint8)])
+
+
+def detect_objects(frame, imgsz=None, draw=False):
     """
     Detects guns and humans in the given frame.
 
     Args:
         frame (numpy.ndarray): The input image/frame from the camera.
+        imgsz (int): Optional YOLO input size; smaller is faster but less accurate.
+        draw (bool): Also draw the detections on the frame (see `draw_detections`); headless,
+            batch and shared-memory callers leave the frame untouched.
 
     Returns:
-        list: A list of detected objects with their labels.
+        tuple: (Detections, frame).
     """
     # Perform object detection
-    results = model(frame)[0]
+    detections = Detections.from_rows(get_backend().predict([frame], imgsz=imgsz)[0])
+    if draw:
+        draw_detections(frame, detections)
+    return detections, frame
+
+
+def detect_objects_batch(frames):
+    """
+    Detects guns and humans in several frames with a single forward pass.
+
+    The frames may come from different cameras and do not need to share a resolution.
+
+    Args:
+        frames (list): The input images/frames (numpy.ndarray).
+
+    Returns:
+        list: One (Detections, frame) tuple per input frame, in input order; nothing is drawn.
+    """
+    if not frames:
+        return []
+
+    results = get_backend().predict(frames)
+    return [(Detections.from_rows(rows), frame) for rows, frame in zip(results, frames)]
+
+
+class DetectionBatcher:
+    """
+    Collects frames submitted from several threads into micro-batches.
+
+    The first frame that arrives opens a batch; the collector then waits at most
+    `max_wait` seconds (or until `max_batch_size` frames are queued) before running
+    one batched forward pass. Each caller gets its own result back, so `detect`
+    can be used as a drop-in replacement for `detect_objects` by every camera.
+    """
+
+    def __init__(self, max_batch_size=8, max_wait=0.02, detect_batch_fn=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.detect_batch_fn = detect_batch_fn or detect_objects_batch
+        self.running = True
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        """Queues a frame for detection and returns a Future with its (detections, frame)."""
+        future = Future()
+        self._queue.put((frame, future))
+        return future
+
+    def detect(self, frame):
+        """Blocking helper with the same signature and result as `detect_objects`."""
+        return self.submit(frame).result()
+
+    def _collect_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
 
-    # Extract the detections
-    detected_objects = []
-    for result in results.boxes.data:
-        x1, y1, x2, y2, score, class_id = result.tolist()
+            frames = [frame for frame, _ in batch]
+            try:
+                results = self.detect_batch_fn(frames)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
 
-        # Check if the detected class is one of our target classes
-        if class_id in TARGET_CLASSES.values():
-            label = list(TARGET_CLASSES.keys())[list(TARGET_CLASSES.values()).index(int(class_id))]
-            detected_objects.append({
-                'label': label,
-                'confidence': score,
-                'bbox': (int(x1), int(y1), int(x2), int(y2))
-            })
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
 
-            # Draw bounding box and label on the frame
-            color = (0, 255, 0) if label == 'person' else (0, 0, 255)  # Green for person, Red for gun
-            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-            cv2.putText(frame, f"{label} {score:.2f}", (int(x1), int(y1) - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    def stop(self):
+        self.running = False
+        self._thread.join(timeout=2)
 
-    return detected_objects, frame
+        # Fail whatever is still waiting so no caller blocks forever
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("DetectionBatcher stopped"))
 
 
 def main():
@@ -59,7 +255,7 @@ def main():
             break
 
         # Detect guns and humans
-        detections, annotated_frame = detect_objects(frame)
+        detections, annotated_frame = detect_objects(frame, draw=True)
 
         # Print detected objects to console
         for detection in detections:
@@ -0,0 +1,140 @@
+import threading
+
+# Quality levels from best to cheapest:
+# (name, run detection every Nth frame, YOLO input size, face recognition every Nth detection)
+QUALITY_LEVELS = [
+    ('full', 1, 640, 1),
+    ('high', 1, 512, 2),
+    ('medium', 2, 416, 3),
+    ('low', 3, 320, 5),
+    ('minimal', 5, 256, 10),
+]
+
+
+class AdaptiveScheduler:
+    """
+    Adapts how much inference a camera gets so results stay within a latency budget.
+
+    The pipeline reports the end-to-end latency of every result (capture to
+    result, so queueing and CPU contention are included) and the time spent in
+    each stage. When the smoothed latency stays above the budget for
+    `downgrade_after` results the scheduler moves to a cheaper quality level;
+    once it stays below `headroom` x budget for `upgrade_after` results it moves
+    back up, until full quality is restored.
+    """
+
+    def __init__(self, latency_budget=0.25, levels=QUALITY_LEVELS, smoothing=0.2, downgrade_after=3,
+                 upgrade_after=30, headroom=0.6, verbose=True):
+        self.latency_budget = latency_budget
+        self.levels = levels
+        self.smoothing = smoothing
+        self.downgrade_after = downgrade_after
+        self.upgrade_after = upgrade_after
+        self.headroom = headroom
+        self.verbose = verbose
+
+        self.level = 0
+        self.latency = None
+        self.stage_times = {}
+        self._over_budget = 0
+        self._under_budget = 0
+        self._last_detected_seq = None
+        self._detections_since_faces = 0
+        self._lock = threading.Lock()
+
+        # Effective rates, counted over the frames offered to the scheduler
+        self.frames_seen = 0
+        self.frames_detected = 0
+        self.faces_scheduled = 0
+
+    @classmethod
+    def from_fps(cls, fps, **kwargs):
+        """Creates a scheduler whose latency budget is one frame at the given rate."""
+        return cls(latency_budget=1.0 / fps, **kwargs)
+
+    @property
+    def mode(self):
+        return self.levels[self.level][0]
+
+    @property
+    def stride(self):
+        return self.levels[self.level][1]
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][2]
+
+    @property
+    def face_every(self):
+        return self.levels[self.level][3]
+
+    def _smooth(self, previous, value):
+        return value if previous is None else previous + self.smoothing * (value - previous)
+
+    def record_stage(self, stage, seconds):
+        """Records how long one run of a stage ('detect', 'recognize', ...) took."""
+        with self._lock:
+            self.stage_times[stage] = self._smooth(self.stage_times.get(stage), seconds)
+
+    def record_latency(self, seconds):
+        """Records the capture-to-result latency of a result and adapts the quality level."""
+        with self._lock:
+            self.latency = self._smooth(self.latency, seconds)
+            if self.latency > self.latency_budget:
+                self._over_budget += 1
+                self._under_budget = 0
+            elif self.latency < self.latency_budget * self.headroom:
+                self._under_budget += 1
+                self._over_budget = 0
+            else:
+                self._over_budget = self._under_budget = 0
+
+            if self._over_budget >= self.downgrade_after and self.level < len(self.levels) - 1:
+                self._change_level(self.level + 1)
+            elif self._under_budget >= self.upgrade_after and self.level > 0:
+                self._change_level(self.level - 1)
+
+    def _change_level(self, level):
+        self.level = level
+        self._over_budget = self._under_budget = 0
+        # Start measuring the new level from scratch
+        self.latency = None
+        if self.verbose:
+            print(f"Inference quality changed: {self.status()}")
+
+    def should_detect(self, seq):
+        """
+        Returns True if the frame with this sequence number is due for detection.
+
+        The pipeline may still skip it (motion gate, empty zones); only frames
+        passed to `record_detected` count as detected and restart the stride.
+        """
+        with self._lock:
+            self.frames_seen += 1
+            return self._last_detected_seq is None or seq - self._last_detected_seq >= self.stride
+
+    def record_detected(self, seq):
+        """Records that the frame with this sequence number was sent to the detector."""
+        with self._lock:
+            self._last_detected_seq = seq
+            self.frames_detected += 1
+
+    def should_recognize(self):
+        """Called once per detection with people in it; True if faces should be recognized."""
+        with self._lock:
+            self._detections_since_faces += 1
+            if self._detections_since_faces < self.face_every:
+                return False
+            self._detections_since_faces = 0
+            self.faces_scheduled += 1
+            return True
+
+    def status(self):
+        """Returns a one-line description of the current mode and effective rates."""
+        stages = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in sorted(self.stage_times.items()))
+        latency = f"{self.latency * 1000:.0f} ms" if self.latency is not None else "n/a"
+        detected = self.frames_detected / self.frames_seen if self.frames_seen else 1.0
+        return (f"Quality {self.mode}: detect every {self.stride} frame(s) at {self.imgsz} px, "
+                f"faces every {self.face_every} detection(s); {detected:.0%} of frames detected; "
+                f"latency {latency} (budget {self.latency_budget * 1000:.0f} ms)"
+                + (f"; {stages}" if stages else ""))
@@ -0,0 +1,287 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Percentiles reported for every stage
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyWindow:
+    """Keeps the last `size` durations of a stage in a ring buffer; percentiles are computed on export."""
+
+    def __init__(self, size=1024):
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._index = 0
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        self._samples[self._index] = seconds
+        self._index = (self._index + 1) % len(self._samples)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self, quantiles=QUANTILES):
+        samples = self._samples[:min(self.count, len(self._samples))]
+        if not len(samples):
+            return {q: None for q in quantiles}
+        return dict(zip(quantiles, np.quantile(samples, quantiles).tolist()))
+
+
+class RateCounter:
+    """Counts events and derives a rate from the timestamps of the most recent ones."""
+
+    def __init__(self, size=256):
+        self._times = deque(maxlen=size)
+        self.count = 0
+
+    def tick(self, now):
+        self._times.append(now)
+        self.count += 1
+
+    def rate(self, now):
+        times = list(self._times)
+        # A stream that stopped should drop to 0, not keep its last rate
+        if len(times) < 2 or now - times[-1] > 5.0:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0]) if times[-1] > times[0] else 0.0
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.stage, time.perf_counter() - self.started)
+
+
+class CameraMetrics:
+    """
+    Stage timings, rates and gauges of one camera (or other component, e.g. 'alerts').
+
+    Recording is O(1): a ring-buffer write or a deque append. Percentiles,
+    rates and gauges (callables such as a queue's qsize) are only evaluated
+    when the metrics are exported.
+    """
+
+    enabled = True
+
+    def __init__(self, camera, window=1024):
+        self.camera = camera
+        self.window = window
+        self._stages = {}
+        self._rates = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def time(self, stage):
+        """Context manager that records how long its block took: `with metrics.time('detect'): ...`."""
+        return _Timer(self, stage)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            window = self._stages.get(stage)
+            if window is None:
+                window = self._stages[stage] = LatencyWindow(self.window)
+            window.record(seconds)
+
+    def tick(self, stream):
+        """Counts one frame (or other event) of a stream; its FPS is reported on export."""
+        now = time.monotonic()
+        with self._lock:
+            counter = self._rates.get(stream)
+            if counter is None:
+                counter = self._rates[stream] = RateCounter()
+            counter.tick(now)
+
+    def gauge(self, name, fn):
+        """Registers a callable that returns the current value of a gauge, e.g. a queue depth."""
+        self._gauges[name] = fn
+
+    def snapshot(self):
+        """Returns the current metrics as a JSON-serializable dict."""
+        now = time.monotonic()
+        with self._lock:
+            stages = {stage: dict(count=window.count, total=window.total,
+                                  **{f"p{int(q * 100)}": value for q, value in window.quantiles().items()})
+                      for stage, window in self._stages.items()}
+            rates = {stream: {'count': counter.count, 'fps': counter.rate(now)}
+                     for stream, counter in self._rates.items()}
+        gauges = {}
+        for name, fn in list(self._gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception as e:  # A gauge must never break the export
+                print(f"Warning: metrics gauge {name} failed: {e}")
+        return {'camera': self.camera, 'stages': stages, 'rates': rates, 'gauges': gauges}
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullMetrics:
+    """Drop-in for CameraMetrics when metrics are disabled; every call is a no-op."""
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def time(self, stage):
+        return self._timer
+
+    def record(self, stage, seconds):
+        pass
+
+    def tick(self, stream):
+        pass
+
+    def gauge(self, name, fn):
+        pass
+
+    def snapshot(self):
+        return {}
+
+
+NULL_METRICS = NullMetrics()
+
+
+class MetricsRegistry:
+    """Hands out one CameraMetrics per camera; a disabled registry hands out NULL_METRICS."""
+
+    def __init__(self, enabled=True, window=1024):
+        self.enabled = enabled
+        self.window = window
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def camera(self, name):
+        if not self.enabled:
+            return NULL_METRICS
+        with self._lock:
+            if name not in self._cameras:
+                self._cameras[name] = CameraMetrics(name, self.window)
+            return self._cameras[name]
+
+    def snapshot(self):
+        with self._lock:
+            cameras = list(self._cameras.values())
+        return {'time': time.time(), 'cameras': [metrics.snapshot() for metrics in cameras]}
+
+    def prometheus_text(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE cctv_stage_seconds summary",
+        ]
+        for camera in snapshot['cameras']:
+            for stage, stats in sorted(camera['stages'].items()):
+                labels = f'camera="{_escape(camera["camera"])}",stage="{_escape(stage)}"'
+                for q in QUANTILES:
+                    value = stats[f"p{int(q * 100)}"]
+                    if value is not None:
+                        lines.append(f'cctv_stage_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+                lines.append(f"cctv_stage_seconds_sum{{{labels}}} {stats['total']:.6f}")
+                lines.append(f"cctv_stage_seconds_count{{{labels}}} {stats['count']}")
+
+        lines.append("# TYPE cctv_fps gauge")
+        for camera in snapshot['cameras']:
+            for stream, stats in sorted(camera['rates'].items()):
+                lines.append(f'cctv_fps{{camera="{_escape(camera["camera"])}",stream="{_escape(stream)}"}} '
+                             f"{stats['fps']:.3f}")
+
+        gauge_names = sorted({name for camera in snapshot['cameras'] for name in camera['gauges']})
+        for name in gauge_names:
+            lines.append(f"# TYPE cctv_{name} gauge")
+            for camera in snapshot['cameras']:
+                if name in camera['gauges']:
+                    lines.append(f'cctv_{name}{{camera="{_escape(camera["camera"])}"}} {camera["gauges"][name]}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsExporter:
+    """
+    Publishes a MetricsRegistry as a Prometheus text endpoint and/or a JSONL file.
+
+    The HTTP server only listens on localhost (`http://127.0.0.1:<port>/metrics`);
+    the JSONL writer appends one snapshot line every `interval` seconds.
+    """
+
+    def __init__(self, registry, port=None, jsonl_path=None, interval=10.0):
+        self.registry = registry
+        self.port = port
+        self.jsonl_path = jsonl_path
+        self.interval = interval
+        self._server = None
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.port is not None:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = registry.prometheus_text().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+            self._threads.append(threading.Thread(target=self._server.serve_forever, daemon=True))
+            print(f"Serving metrics on http://127.0.0.1:{self._server.server_address[1]}/metrics")
+
+        if self.jsonl_path:
+            self._threads.append(threading.Thread(target=self._write_loop, daemon=True))
+
+        for thread in self._threads:
+            thread.start()
+
+    def _write_loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        try:
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.registry.snapshot()) + "\n")
+        except OSError as e:
+            print(f"Warning: could not write metrics: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self.jsonl_path:
+            self.write_snapshot()
+        for thread in self._threads:
+            thread.join(timeout=2)
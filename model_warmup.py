@@ -0,0 +1,51 @@
+import threading
+import time
+
+import face_recognition_module
+import gun_and_human_detection
+
+
+class ModelWarmup(threading.Thread):
+    """
+    Loads the models in the background and runs one dummy inference on each.
+
+    Importing the detection and recognition modules is cheap; the YOLO model,
+    the dlib models and the known-face gallery are only loaded by `warm_up`
+    calls, which this thread makes right after launch so the window can show
+    immediately. `ready` is set when every step finished, `status()` returns a
+    line of text for the UI. Code that needs a model before it is ready simply
+    waits for it on first use.
+    """
+
+    def __init__(self, steps=None):
+        super().__init__(daemon=True)
+        self.steps = steps if steps is not None else [
+            ('object detector', gun_and_human_detection.warm_up),
+            ('face recognition', face_recognition_module.warm_up),
+        ]
+        self.ready = threading.Event()
+        self.current = None
+        self.error = None
+        self.seconds = None
+
+    def run(self):
+        started = time.monotonic()
+        for name, warm_up in self.steps:
+            self.current = name
+            try:
+                warm_up()
+            except Exception as e:  # Any loading problem must reach the UI instead of killing the thread
+                self.error = f"{name}: {e}"
+                print(f"Error: could not load the {name} model: {e}")
+                return
+        self.current = None
+        self.seconds = time.monotonic() - started
+        print(f"Models ready after {self.seconds:.1f} s")
+        self.ready.set()
+
+    def status(self):
+        if self.error:
+            return f"Model loading failed ({self.error})"
+        if self.ready.is_set():
+            return f"Models ready ({self.seconds:.1f} s)"
+        return f"Loading {self.current or 'models'}..."
@@ -0,0 +1,105 @@
+import time
+
+import cv2
+
+
+class MotionGate:
+    """
+    Cheap motion check in front of object detection.
+
+    Each frame is reduced to a small, blurred grayscale copy and compared either
+    with the previous frame ('diff') or with an OpenCV MOG2 background model
+    ('mog2'). Full detection should only run when the fraction of changed pixels
+    reaches `threshold`, or when `keepalive` seconds passed since the last frame
+    that was let through, so a static scene is still checked from time to time.
+    """
+
+    def __init__(self, threshold=0.01, keepalive=5.0, method='diff', width=160, pixel_threshold=25,
+                 verbose=True):
+        if method not in ('diff', 'mog2'):
+            raise ValueError(f"Unknown motion gate method: {method}")
+
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.verbose = verbose
+
+        self._previous = None
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if method == 'mog2' else None
+        self._last_passed = None
+        self._active = True
+
+        # Gate statistics
+        self.evaluated = 0
+        self.skipped = 0
+        self.motion_level = 0.0
+        self.last_reason = None
+
+    def _prepare(self, frame):
+        height = max(1, int(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def measure(self, frame):
+        """Returns the fraction of pixels that changed, between 0 and 1."""
+        gray = self._prepare(frame)
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(gray)
+        else:
+            if self._previous is None or self._previous.shape != gray.shape:
+                self._previous = gray
+                return 1.0
+            mask = cv2.absdiff(gray, self._previous)
+            self._previous = gray
+        _, mask = cv2.threshold(mask, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def should_process(self, frame, now=None):
+        """
+        Decides whether the frame should go through full detection.
+
+        Args:
+            frame (numpy.ndarray): The input image/frame from the camera.
+            now (float): Current time in seconds, defaults to time.monotonic().
+
+        Returns:
+            bool: True when there is enough motion or the keep-alive interval passed.
+        """
+        now = time.monotonic() if now is None else now
+        self.evaluated += 1
+        self.motion_level = self.measure(frame)
+
+        if self.motion_level >= self.threshold:
+            self.last_reason = 'motion'
+        elif self._last_passed is None or now - self._last_passed >= self.keepalive:
+            self.last_reason = 'keepalive'
+        else:
+            self.last_reason = 'static'
+
+        passed = self.last_reason != 'static'
+        if passed:
+            self._last_passed = now
+        else:
+            self.skipped += 1
+
+        # Report when the scene switches between moving and static
+        active = self.last_reason == 'motion'
+        if self.verbose and active != self._active:
+            if active:
+                print(f"Motion detected ({self.motion_level:.1%}), resuming detection.")
+            else:
+                print(f"Scene static, pausing detection (keep-alive every {self.keepalive:.0f}s).")
+        self._active = active
+        return passed
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.evaluated if self.evaluated else 0.0
+
+    def report(self):
+        """Returns a one-line summary of the gate decisions."""
+        return (f"Motion gate: {self.evaluated - self.skipped}/{self.evaluated} frames detected, "
+                f"{self.skip_ratio:.0%} skipped, last motion {self.motion_level:.1%} ({self.last_reason})")
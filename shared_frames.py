@@ -0,0 +1,396 @@
+"""
+Multi-process inference on frames in shared memory.
+
+Detection and face recognition each run in their own worker process, so YOLO
+post-processing, dlib encoding and the Tk display no longer compete for one
+GIL. Frames are copied once into a preallocated `multiprocessing.shared_memory`
+ring of fixed-shape buffers; the workers get only the slot index and read the
+frame in place (no pickling, no copy), and send back small result records.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from frame_pipeline import FramePipeline
+
+
+class SharedFrameRing:
+    """
+    A fixed number of equally shaped uint8 frame buffers in one shared memory block.
+
+    The creating process owns the block (`unlink` frees it); worker processes
+    `attach` by name and get numpy views of the same memory.
+    """
+
+    def __init__(self, shape, slots, shm, owner):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.shm = shm
+        self.owner = owner
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, slots=4):
+        size = slots * int(np.prod(shape))
+        return cls(shape, slots, shared_memory.SharedMemory(create=True, size=size), owner=True)
+
+    @classmethod
+    def attach(cls, name, shape, slots):
+        # Workers are children of the owner and share its resource tracker, so attaching does not
+        # make the block disappear when a worker exits; only the owner's unlink frees it
+        return cls(shape, slots, shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, slot, frame):
+        np.copyto(self.frames[slot], frame)
+
+    def frame(self, slot):
+        """Returns a view of the frame in a slot; it changes when the slot is written again."""
+        return self.frames[slot]
+
+    def close(self):
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A view is still referenced somewhere; the mapping goes away with the process
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _detector_worker(ring_name, shape, slots, tasks, results, backend, weights):
+    """Detector process: runs YOLO on ring slots and sends back ('detect', seq, slot, detections, seconds)."""
+    try:
+        import gun_and_human_detection
+
+        ring = SharedFrameRing.attach(ring_name, shape, slots)
+        if backend:
+            gun_and_human_detection.set_backend(backend, weights)
+        gun_and_human_detection.warm_up(shape[1], shape[0])
+    except Exception as e:  # Missing weights, libraries or memory: tell the main process instead of just exiting
+        results.put(('failed', 'detect', f"{type(e).__name__}: {e}"))
+        return
+    results.put(('ready', 'detect'))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, imgsz, rect = task
+        started = time.perf_counter()
+        frame = ring.frame(slot)
+        if rect:
+            # Detection zones: only the active area, in crop coordinates (the main process maps them back)
+            x1, y1, x2, y2 = rect
+            frame = np.ascontiguousarray(frame[y1:y2, x1:x2])
+        try:
+            # Never draw: the frame is the shared buffer itself
+            detections, _ = gun_and_human_detection.detect_objects(frame, imgsz=imgsz, draw=False)
+        except Exception as e:  # Report and keep serving; the main process frees the slot
+            results.put(('error', 'detect', seq, slot, str(e)))
+            continue
+        results.put(('detect', seq, slot, detections, time.perf_counter() - started))
+    ring.close()
+
+
+def _recognizer_worker(ring_name, shape, slots, tasks, results, faces_in_people, gallery_reload_interval):
+    """Recognizer process: tracks and identifies faces, sends back ('faces', seq, slot, faces, seconds)."""
+    try:
+        import face_recognition_module
+        from face_tracker import FaceTracker
+        from gallery_watcher import GalleryWatcher
+
+        ring = SharedFrameRing.attach(ring_name, shape, slots)
+        face_recognition_module.warm_up()
+        face_tracker = FaceTracker()
+    except Exception as e:  # Missing models, libraries or memory: tell the main process instead of just exiting
+        results.put(('failed', 'recognize', f"{type(e).__name__}: {e}"))
+        return
+    if gallery_reload_interval:
+        # This process holds the gallery in use, so it also picks up changes to known_faces
+        GalleryWatcher(gallery_reload_interval).start()
+    results.put(('ready', 'recognize'))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, person_boxes = task
+        started = time.perf_counter()
+        try:
+            faces, _ = face_tracker.recognize(ring.frame(slot), person_boxes if faces_in_people else None,
+                                              draw=False)
+        except Exception as e:  # Report and keep serving; the main process frees the slot
+            results.put(('error', 'recognize', seq, slot, str(e)))
+            continue
+        results.put(('faces', seq, slot, faces, time.perf_counter() - started))
+    ring.close()
+
+
+class ProcessPipeline(FramePipeline):
+    """
+    FramePipeline whose detection and recognition stages run in worker processes.
+
+    Capture, the motion gate, the scheduler, callbacks and the render stage stay
+    in this process and behave like in FramePipeline. The dispatcher only hands
+    a new frame to the detector once the previous one is done, so the detector
+    always gets the newest frame; recognition keeps at most one pending frame.
+    Slots are only reused once no worker refers to them any more, so a frame is
+    never overwritten while it is being read. The ring is created with the
+    shape of the first frame; frames of another shape are skipped.
+
+    If a worker cannot load its model or dies (e.g. a crash in dlib or torch),
+    the pipeline stops with `error` set, like FramePipeline after repeated
+    failures, so the app can show it and the service can restart the camera.
+    """
+
+    def __init__(self, capture, on_detections=None, on_faces=None, slots=4, max_result_age=1.0, motion_gate=None,
+                 faces_in_people=True, scheduler=None, metrics=None, detector_backend=None, detector_weights=None,
+                 gallery_reload_interval=None, zones=None):
+        # One slot is being written while the others may be in detection, in recognition and pending
+        if slots < 3:
+            raise ValueError(f"A shared frame ring needs at least 3 slots, got {slots}")
+        super().__init__(capture, None, None, on_detections=on_detections, on_faces=on_faces,
+                         max_result_age=max_result_age, motion_gate=motion_gate, faces_in_people=faces_in_people,
+                         scheduler=scheduler, metrics=metrics, zones=zones)
+        self.slots = slots
+        self.detector_backend = detector_backend
+        self.detector_weights = detector_weights
+        self.gallery_reload_interval = gallery_reload_interval
+
+        # spawn: forking a process that already runs threads (and maybe torch) is not safe
+        self._context = multiprocessing.get_context('spawn')
+        self.ring = None
+        self._processes = {}
+        self._next_process_check = 0.0
+        self._detect_tasks = self._context.Queue()
+        self._recognize_tasks = self._context.Queue()
+        self._results = self._context.Queue()
+
+        self._slots_in_use = set()
+        self._slot_timestamps = {}
+        self._detector_idle = threading.Event()
+        self._detector_idle.set()
+        self._recognizer_busy = False
+        self._pending_recognition = None
+        self.ready = set()  # Stages whose worker finished loading its model
+
+    def model_status(self):
+        """Returns a status line while a worker is still loading its model, None once both are ready."""
+        # Same names as the ModelWarmup steps of the in-process mode
+        loading = [name for stage, name in (('detect', 'object detector'), ('recognize', 'face recognition'))
+                   if stage not in self.ready]
+        if not loading:
+            return None
+        return f"Loading {' and '.join(loading)} in the worker processes..."
+
+    def _start_workers(self, shape):
+        self.ring = SharedFrameRing.create(shape, self.slots)
+        self._processes = {
+            'detect': self._context.Process(target=_detector_worker, daemon=True,
+                                            args=(self.ring.name, shape, self.slots, self._detect_tasks,
+                                                  self._results, self.detector_backend, self.detector_weights)),
+            'recognize': self._context.Process(target=_recognizer_worker, daemon=True,
+                                               args=(self.ring.name, shape, self.slots, self._recognize_tasks,
+                                                     self._results, self.faces_in_people,
+                                                     self.gallery_reload_interval)),
+        }
+        for process in self._processes.values():
+            process.start()
+
+    def stop(self):
+        super().stop()
+        for tasks in (self._detect_tasks, self._recognize_tasks):
+            tasks.put(None)
+        for process in self._processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = {}
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+    def _acquire_slot(self):
+        with self._lock:
+            slot = next(i for i in range(self.slots) if i not in self._slots_in_use)
+            self._slots_in_use.add(slot)
+            return slot
+
+    def _release_slot(self, slot):
+        with self._lock:
+            self._slots_in_use.discard(slot)
+            self._slot_timestamps.pop(slot, None)
+
+    def _detection_loop(self):
+        """Dispatcher: sends the newest frame to the detector process whenever it is idle."""
+        last_seq = 0
+        while self.running:
+            if not self._detector_idle.wait(0.5):
+                continue
+            item = self.capture.read_latest(last_seq)
+            if item is None:
+                if self.capture.finished:
+                    break
+                continue
+
+            seq, timestamp, frame = item
+            if last_seq:
+                self.dropped_frames += seq - last_seq - 1
+            last_seq = seq
+
+            if self.scheduler and not self.scheduler.should_detect(seq):
+                continue
+            rect = self.zones.crop_rect(frame.shape) if self.zones else None
+            if self.zones and rect is None:
+                continue
+            if self.motion_gate:
+                region = frame[rect[1]:rect[3], rect[0]:rect[2]] if rect else frame
+                with self.metrics.time('motion_gate'):
+                    process = self.motion_gate.should_process(region)
+                if not process:
+                    continue
+
+            if self.ring is None:
+                self._start_workers(frame.shape)
+            elif frame.shape != self.ring.shape:
+                print(f"Warning: skipping a {frame.shape} frame, the shared frame ring holds {self.ring.shape}")
+                continue
+
+            if self.scheduler:
+                self.scheduler.record_detected(seq)
+            slot = self._acquire_slot()
+            self.ring.write(slot, frame)
+            with self._lock:
+                self._slot_timestamps[slot] = timestamp
+            self._detector_idle.clear()
+            self._detect_tasks.put((seq, slot, self.scheduler.imgsz if self.scheduler else None, rect))
+
+    def _dispatch_recognition(self, seq, slot, person_boxes):
+        """Sends a frame to the recognizer, or keeps it as the (single) pending one while it is busy."""
+        with self._lock:
+            if self._recognizer_busy:
+                replaced, self._pending_recognition = self._pending_recognition, (seq, slot, person_boxes)
+            else:
+                self._recognizer_busy = True
+                replaced = None
+                self._recognize_tasks.put((seq, slot, person_boxes))
+        if replaced:
+            self._release_slot(replaced[1])
+
+    def _recognition_done(self, slot):
+        self._release_slot(slot)
+        with self._lock:
+            pending, self._pending_recognition = self._pending_recognition, None
+            if pending:
+                self._recognize_tasks.put(pending)
+            else:
+                self._recognizer_busy = False
+
+    def _worker_failed(self, stage, message):
+        if not self.running:
+            return
+        self.error = f"the {stage} worker failed ({message})"
+        print(f"Error: stopping the pipeline, {self.error}")
+        self.running = False
+
+    def _check_processes(self):
+        """Notices worker processes that died without reporting, e.g. from a crash in native code."""
+        now = time.monotonic()
+        if now < self._next_process_check:
+            return
+        self._next_process_check = now + 0.5
+        for stage, process in list(self._processes.items()):
+            if process.exitcode is not None:
+                self._worker_failed(stage, f"process exited with code {process.exitcode}")
+
+    def _recognition_loop(self):
+        """Collector: applies the result records of both worker processes and watches the processes."""
+        while self.running:
+            self._check_processes()
+            try:
+                record = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            kind = record[0]
+            if kind == 'ready':
+                self.ready.add(record[1])
+                continue
+            if kind == 'failed':
+                self._worker_failed(record[1], record[2])
+                continue
+            if kind == 'error':
+                _, stage, seq, slot, message = record
+                if stage == 'detect':
+                    self._release_slot(slot)
+                    self._detector_idle.set()
+                else:
+                    self._recognition_done(slot)
+                self._stage_failed(stage, seq, message)
+                continue
+
+            _, seq, slot, result, seconds = record
+            with self._lock:
+                timestamp = self._slot_timestamps.get(slot, time.monotonic())
+            finished = time.monotonic()
+            stage = 'detect' if kind == 'detect' else 'recognize'
+            if self.scheduler:
+                self.scheduler.record_stage(stage, seconds)
+                self.scheduler.record_latency(finished - timestamp)
+            self.metrics.record(stage, seconds)
+            self.metrics.record(f"{stage}_latency", finished - timestamp)
+            self.metrics.tick(stage)
+
+            try:
+                if kind == 'detect':
+                    self._handle_detections(seq, slot, timestamp, result)
+                else:
+                    self._handle_faces(seq, slot, timestamp, result)
+            except Exception as e:  # A failing callback must not end the collector
+                self._stage_failed(stage, seq, e)
+            else:
+                self._stage_succeeded(stage)
+
+    def _handle_detections(self, seq, slot, timestamp, detections):
+        person_boxes = []
+        try:
+            if self.zones:
+                detections = self.zones.apply(detections, self.zones.crop_rect(self.ring.shape)[:2],
+                                              self.ring.shape)
+            with self._lock:
+                self.detection_result = (seq, timestamp, detections)
+            person_boxes = detections.boxes_of('person')
+            if self.on_detections:
+                self.on_detections(seq, detections)
+        finally:
+            # Even when a callback failed, the slot must be passed on or freed and the detector fed again
+            if person_boxes and (not self.scheduler or self.scheduler.should_recognize()):
+                self._dispatch_recognition(seq, slot, person_boxes)
+            else:
+                self._release_slot(slot)
+            self._detector_idle.set()
+
+    def _handle_faces(self, seq, slot, timestamp, faces):
+        try:
+            if self.zones and not self.faces_in_people:
+                faces = self.zones.filter_faces(faces, self.ring.shape)
+            with self._lock:
+                self.face_result = (seq, timestamp, faces)
+            # The slot is reused after this, so the callback gets its own copy
+            frame = self.ring.frame(slot).copy() if self.on_faces and self.ring else None
+        finally:
+            self._recognition_done(slot)
+        if self.on_faces:
+            self.on_faces(seq, faces, frame)
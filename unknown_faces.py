@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from face_gallery import FaceGallery
+
+UNKNOWN_FACES_DIR = "unknown_faces"
+INDEX_FILE = "clusters.json"
+CENTROIDS_FILE = "centroids.npy"
+
+
+def crop_face(frame, location, padding=0.2):
+    """Returns the face at (top, right, bottom, left) with some margin, clipped to the frame."""
+    top, right, bottom, left = location
+    pad_y, pad_x = int((bottom - top) * padding), int((right - left) * padding)
+    height, width = frame.shape[:2]
+    return frame[max(0, top - pad_y):min(height, bottom + pad_y), max(0, left - pad_x):min(width, right + pad_x)]
+
+
+class UnknownFaceStore:
+    """
+    Groups unknown faces into one cluster per distinct person.
+
+    Every new encoding is matched against the cluster centroids (a FaceGallery,
+    so a lookup is one matrix product over the clusters). Within
+    `match_distance` it joins the closest cluster and moves its centroid,
+    otherwise it starts a new cluster. A cluster keeps one representative crop
+    (the largest face seen so far) and a bounded list of sighting timestamps,
+    so storage and lookup cost grow with the number of distinct people rather
+    than with the number of frames. When there are more than `max_clusters`
+    clusters, the ones not seen for the longest time are evicted together
+    with their crops.
+
+    The index is written to disk only when clusters are created or evicted and
+    on `save`, never per sighting.
+    """
+
+    def __init__(self, directory=UNKNOWN_FACES_DIR, match_distance=0.5, max_clusters=500, max_sightings=100,
+                 sighting_gap=2.0, max_weight=20):
+        self.directory = directory
+        self.match_distance = match_distance
+        self.max_clusters = max_clusters
+        self.max_sightings = max_sightings
+        self.sighting_gap = sighting_gap  # Seconds; closer sightings only update 'last_seen'
+        self.max_weight = max_weight  # Caps the running mean so centroids keep adapting
+
+        self._lock = threading.Lock()
+        self.gallery = FaceGallery()  # Centroids, gallery names are the cluster ids
+        self.clusters = {}
+        self._next_id = 1
+        self._load()
+
+    def _load(self):
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            centroids = np.load(os.path.join(self.directory, CENTROIDS_FILE))
+        except (OSError, ValueError) as e:
+            if os.path.exists(index_path):
+                print(f"Warning: could not load unknown face clusters, starting empty: {e}")
+            return
+
+        clusters = index.get('clusters', [])
+        if len(clusters) != len(centroids):
+            print("Warning: unknown face index does not match its centroids, starting empty")
+            return
+        for cluster in clusters:
+            cluster['sightings'] = deque(cluster['sightings'], maxlen=self.max_sightings)
+            self.clusters[cluster['id']] = cluster
+        self.gallery = FaceGallery(centroids, [cluster['id'] for cluster in clusters])
+        self._next_id = index.get('next_id', len(clusters) + 1)
+
+    def _save(self):
+        """Writes the index and centroids; must be called with the lock held."""
+        os.makedirs(self.directory, exist_ok=True)
+        clusters = [dict(self.clusters[cluster_id], sightings=list(self.clusters[cluster_id]['sightings']))
+                    for cluster_id in self.gallery.names]
+        centroids_path = os.path.join(self.directory, CENTROIDS_FILE)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            # np.save appends .npy to names without it, so the temporary file keeps the extension
+            np.save(centroids_path + ".tmp.npy", self.gallery.encodings)
+            os.replace(centroids_path + ".tmp.npy", centroids_path)
+            with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({'next_id': self._next_id, 'clusters': clusters}, f)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError as e:
+            print(f"Warning: could not save unknown face clusters: {e}")
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def add(self, encoding, frame=None, location=None, timestamp=None):
+        """
+        Adds one sighting of an unknown face.
+
+        Args:
+            encoding (numpy.ndarray): The 128-d face encoding.
+            frame (numpy.ndarray): BGR frame the face was found in, used for the representative crop.
+            location (tuple): Face box (top, right, bottom, left) in `frame`.
+            timestamp (float): Time of the sighting, defaults to now.
+
+        Returns:
+            tuple: (cluster_id, is_new).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        encoding = np.asarray(encoding, dtype=np.float32)
+        with self._lock:
+            cluster = None
+            if len(self.gallery):
+                indices, distances = self.gallery.top_k([encoding], k=1)
+                if distances[0, 0] <= self.match_distance:
+                    row = int(indices[0, 0])
+                    cluster = self.clusters[self.gallery.names[row]]
+                    self._update_cluster(row, cluster, encoding, timestamp)
+
+            is_new = cluster is None
+            if is_new:
+                cluster = self._new_cluster(encoding, timestamp)
+
+            if frame is not None and location is not None:
+                self._update_crop(cluster, frame, location)
+            if is_new:
+                self._evict()
+                self._save()
+            return cluster['id'], is_new
+
+    def _new_cluster(self, encoding, timestamp):
+        cluster_id = f"unknown_{self._next_id:05d}"
+        self._next_id += 1
+        cluster = {
+            'id': cluster_id,
+            'count': 1,
+            'first_seen': timestamp,
+            'last_seen': timestamp,
+            'sightings': deque([timestamp], maxlen=self.max_sightings),
+            'crop': None,
+            'crop_area': 0,
+        }
+        self.clusters[cluster_id] = cluster
+        self.gallery = self.gallery.add(encoding, cluster_id)
+        return cluster
+
+    def _update_cluster(self, row, cluster, encoding, timestamp):
+        cluster['count'] += 1
+        weight = min(cluster['count'], self.max_weight)
+        centroid = self.gallery.encodings[row]
+        self.gallery.update(row, centroid + (encoding - centroid) / weight)
+
+        if timestamp - cluster['last_seen'] >= self.sighting_gap:
+            cluster['sightings'].append(timestamp)
+        cluster['last_seen'] = max(cluster['last_seen'], timestamp)
+
+    def _update_crop(self, cluster, frame, location):
+        """Keeps the largest view of the face; replaced only when clearly larger, so writes stay rare."""
+        top, right, bottom, left = location
+        area = (bottom - top) * (right - left)
+        if cluster['crop'] is not None and area < cluster['crop_area'] * 1.25:
+            return
+
+        crop = crop_face(frame, location)
+        if crop.size == 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{cluster['id']}.jpg")
+        if cv2.imwrite(path, crop):
+            cluster['crop'] = path
+            cluster['crop_area'] = area
+        else:
+            print(f"Error: could not save {path}")
+
+    def _evict(self):
+        """Drops the least recently seen clusters above the size budget; must be called with the lock held."""
+        excess = len(self.clusters) - self.max_clusters
+        if excess <= 0:
+            return
+
+        last_seen = np.array([self.clusters[cluster_id]['last_seen'] for cluster_id in self.gallery.names])
+        rows = np.argsort(last_seen, kind='stable')[:excess]
+        for row in rows:
+            cluster = self.clusters.pop(self.gallery.names[row])
+            if cluster['crop']:
+                try:
+                    os.remove(cluster['crop'])
+                except OSError:
+                    pass
+        self.gallery = self.gallery.remove(rows)
+        print(f"Evicted {excess} old unknown face cluster(s)")